@@ -2,20 +2,69 @@ import os
 import logging
 import signal
 import sys
+import time
+import queue
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
 from apscheduler.schedulers.blocking import BlockingScheduler
 from dotenv import load_dotenv
 from database_manager import DatabaseManager
 from data_generator import DataGenerator
+from rate_limiter import TokenBucket, LatencyBackoff
+from workload_profiles import ConstantProfile, load_profile, event_mix_from_env
+
+
+def pace_batches(profile, bucket, backoff, insert, rate_share=1.0, batch_period=1.0,
+                 max_batch_size=1000, report_interval=10.0, report=None):
+    """Call insert(batch_size, mix) forever at the profile's rate, throttled by bucket and backoff;
+    report(written, seconds) is called every report_interval seconds"""
+    started = last_report = time.monotonic()
+    written = 0
+    
+    while True:
+        elapsed = time.monotonic() - started
+        backoff.set_target(profile.rate_at(elapsed) * rate_share)
+        bucket.set_rate(backoff.rate, capacity=max(1.0, backoff.rate * batch_period))
+        
+        # Size batches so they go out roughly every batch_period seconds. The wait is bounded,
+        # so a rate that dropped to (near) zero is re-read from the profile instead of
+        # blocking this loop for as long as one batch would take at that rate
+        batch_size = max(1, min(max_batch_size, int(backoff.rate * batch_period)))
+        if bucket.acquire(batch_size, timeout=max(batch_period, 0.25)) is not None:
+            batch_started = time.monotonic()
+            written += insert(batch_size, profile.mix_at(elapsed))
+            backoff.observe(time.monotonic() - batch_started)
+        
+        now = time.monotonic()
+        if now - last_report >= report_interval:
+            if report:
+                report(written, now - last_report)
+            last_report = now
+            written = 0
+
 
 class TwitterApp:
     """Main application class that orchestrates the Twitter data generation"""
     
-    def __init__(self):
+    def __init__(self, worker_index=None, progress_queue=None):
+        # worker_index is set when running as one of several generator processes
+        self.worker_index = worker_index
+        self.progress_queue = progress_queue
         self._setup_logging()
         self._load_config()
         self.db_manager = DatabaseManager()
+        if self.writer_threads > self.db_manager.pool_max_size:
+            self.logger.warning(
+                f"WRITER_THREADS={self.writer_threads} exceeds DB_POOL_MAX_SIZE="
+                f"{self.db_manager.pool_max_size}; writers will queue for connections"
+            )
         self.data_generator = DataGenerator(self.db_manager)
         self.scheduler = BlockingScheduler()
+        self.writer_pool = ThreadPoolExecutor(max_workers=self.writer_threads) if self.writer_threads > 1 else None
+        self.workers = []
+        self.events_written = 0
+        self._shutting_down = False
         self._setup_signal_handlers()
     
     def _setup_logging(self):
@@ -27,12 +76,53 @@ class TwitterApp:
             level=getattr(logging, log_level),
             format='%(asctime)s - %(levelname)s - %(name)s - %(message)s'
         )
-        self.logger = logging.getLogger(__name__)
+        name = __name__ if self.worker_index is None else f"{__name__}.worker{self.worker_index}"
+        self.logger = logging.getLogger(name)
     
     def _load_config(self):
         """Load application configuration from environment variables"""
+        # 'interval' runs one insert every INSERT_INTERVAL_SECONDS, 'rate' paces to TARGET_EVENTS_PER_SECOND
+        self.load_mode = os.getenv('LOAD_MODE', 'interval').lower()
+        if self.load_mode not in ('interval', 'rate'):
+            raise ValueError(f"Invalid LOAD_MODE: {self.load_mode}")
+        
         self.insert_interval = int(os.getenv('INSERT_INTERVAL_SECONDS', '5'))
-        self.logger.info(f"Configured to insert data every {self.insert_interval} seconds")
+        
+        self.target_rate = float(os.getenv('TARGET_EVENTS_PER_SECOND', '10'))
+        self.batch_period = float(os.getenv('LOAD_BATCH_PERIOD_SECONDS', '0.1'))
+        self.max_batch_size = int(os.getenv('LOAD_MAX_BATCH_SIZE', '1000'))
+        self.backoff_latency = float(os.getenv('BACKOFF_LATENCY_MS', '250')) / 1000
+        self.report_interval = float(os.getenv('RATE_REPORT_INTERVAL_SECONDS', '10'))
+        
+        # Worker processes, each with its own connections and a disjoint slice of users
+        self.worker_processes = int(os.getenv('WORKER_PROCESSES', '1'))
+        seed = os.getenv('GENERATOR_SEED')
+        self.seed = int(seed) if seed else None
+        
+        # Rates are shared evenly between worker processes
+        self.rate_share = 1.0 / self.worker_processes if self.worker_index is not None else 1.0
+        
+        # Event type weights, unless a workload profile brings its own
+        self.event_mix = event_mix_from_env()
+        
+        # A workload profile drives the rate and event mix over time and implies rate mode
+        self.workload_profile = None
+        profile_path = os.getenv('WORKLOAD_PROFILE')
+        if profile_path:
+            self.workload_profile = load_profile(profile_path, self.event_mix)
+            self.load_mode = 'rate'
+            self.logger.info(f"Following workload profile {profile_path}")
+        elif self.load_mode == 'rate':
+            if self.target_rate <= 0:
+                raise ValueError(f"TARGET_EVENTS_PER_SECOND must be positive, got {self.target_rate}")
+            self.logger.info(f"Configured to insert data at {self.target_rate:g} events/s")
+        else:
+            self.logger.info(f"Configured to insert data every {self.insert_interval} seconds")
+        
+        # Concurrent writers per tick; each holds one pooled connection while it writes
+        self.writer_threads = int(os.getenv('WRITER_THREADS', '1'))
+        if self.writer_threads > 1:
+            self.logger.info(f"Using {self.writer_threads} concurrent writer threads")
     
     def _setup_signal_handlers(self):
         """Set up signal handlers for graceful shutdown"""
@@ -41,6 +131,11 @@ class TwitterApp:
     
     def _signal_handler(self, sig, frame):
         """Handle interrupt signals"""
+        # A second signal (e.g. sent to the whole process group) must not re-enter
+        # shutdown while it is already joining writer threads
+        if self._shutting_down:
+            return
+        self._shutting_down = True
         self.logger.info("Interrupt signal received, shutting down gracefully...")
         self.shutdown()
         sys.exit(0)
@@ -53,11 +148,26 @@ class TwitterApp:
             # Connect to database
             self.db_manager.connect()
             
-            # Initialize database schema
-            self.db_manager.init_database()
+            if self.worker_index is None:
+                # Initialize database schema (done once by the parent when running workers)
+                self.db_manager.init_database()
+            else:
+                self.data_generator.set_partition(self.worker_index, self.worker_processes)
+            
+            if self.seed is not None:
+                self.data_generator.seed(self.seed + (self.worker_index or 0))
             
-            # Load or create initial users
-            self.data_generator.load_or_create_users()
+            if self.worker_processes > 1 and self.worker_index is None:
+                # Workers only load their own slice, so seed every slice before spawning them
+                self.data_generator.ensure_partition_users(self.worker_processes)
+            else:
+                # Load or create initial users
+                self.data_generator.load_or_create_users()
+            
+            if self.worker_processes == 1 or self.worker_index is not None:
+                self.data_generator.load_recent_tweet_ids()
+                self.data_generator.load_follow_graph()
+                self.data_generator.configure_counters()
             
             self.logger.info("Application initialized successfully")
             return True
@@ -66,11 +176,118 @@ class TwitterApp:
             self.logger.error(f"Error during initialization: {e}")
             return False
     
+    def insert_tick(self):
+        """Run one round of inserts, fanning out across writer threads if configured"""
+        if self.writer_pool is None:
+            written = self.data_generator.insert_random_data()
+        else:
+            futures = [
+                self.writer_pool.submit(self.data_generator.insert_random_data)
+                for _ in range(self.writer_threads)
+            ]
+            written = sum(future.result() for future in futures)
+        self.events_written += written
+    
+    def insert_batch(self, count, mix=None):
+        """Insert count events as batches, split across writer threads if configured"""
+        if self.writer_pool is None:
+            return self.data_generator.insert_random_batch(count, mix)
+        
+        share, remainder = divmod(count, self.writer_threads)
+        futures = [
+            self.writer_pool.submit(self.data_generator.insert_random_batch, share + (i < remainder), mix)
+            for i in range(self.writer_threads)
+            if share + (i < remainder) > 0
+        ]
+        return sum(future.result() for future in futures)
+    
+    def run_rate_mode(self):
+        """Pace batched inserts to the target rate, backing off while Postgres latency is high"""
+        profile = self.workload_profile or ConstantProfile(self.target_rate, mix=self.event_mix)
+        initial_rate = max(profile.rate_at(0) * self.rate_share, 1e-6)
+        bucket = TokenBucket(initial_rate, capacity=max(1.0, initial_rate * self.batch_period))
+        backoff = LatencyBackoff(initial_rate, self.backoff_latency)
+        
+        def insert(batch_size, mix):
+            written = self.insert_batch(batch_size, mix)
+            self.events_written += written
+            return written
+        
+        def report(written, seconds):
+            self.logger.info(
+                f"Achieved {written / seconds:.1f} events/s "
+                f"(target {backoff.target_rate:g}, admitted {backoff.rate:.1f}, "
+                f"avg batch latency {(backoff.smoothed_latency or 0) * 1000:.0f} ms)"
+            )
+            pending = self.data_generator.pending
+            if len(pending):
+                self.logger.warning(
+                    f"{len(pending)} events buffered until the database is back "
+                    f"({pending.dropped} dropped so far)"
+                )
+        
+        pace_batches(
+            profile, bucket, backoff, insert,
+            rate_share=self.rate_share,
+            batch_period=self.batch_period,
+            max_batch_size=self.max_batch_size,
+            report_interval=self.report_interval,
+            report=report
+        )
+    
+    def _report_progress(self):
+        """Send this worker's event count to the parent every report interval"""
+        reported = 0
+        while True:
+            time.sleep(self.report_interval)
+            written = self.events_written
+            self.progress_queue.put((self.worker_index, written - reported))
+            reported = written
+    
+    def run_workers(self):
+        """Run the generator in worker processes and log their aggregated throughput"""
+        context = multiprocessing.get_context('spawn')
+        progress_queue = context.Queue()
+        self.workers = [
+            context.Process(
+                target=run_worker,
+                args=(index, progress_queue),
+                name=f"generator-worker-{index}"
+            )
+            for index in range(self.worker_processes)
+        ]
+        for worker in self.workers:
+            worker.start()
+        self.logger.info(f"Started {len(self.workers)} generator worker processes")
+        
+        totals = [0] * self.worker_processes
+        window = 0
+        last_report = time.monotonic()
+        
+        while any(worker.is_alive() for worker in self.workers):
+            try:
+                index, count = progress_queue.get(timeout=self.report_interval)
+                totals[index] += count
+                window += count
+            except queue.Empty:
+                pass
+            
+            now = time.monotonic()
+            if now - last_report >= self.report_interval:
+                self.logger.info(
+                    f"Workers achieved {window / (now - last_report):.1f} events/s combined; "
+                    f"totals per worker: {totals}"
+                )
+                window = 0
+                last_report = now
+        
+        self.logger.info("All generator workers exited")
+    
     def setup_scheduler(self):
         """Set up the periodic data insertion scheduler"""
         try:
             self.scheduler.add_job(
-                func=self.data_generator.insert_random_data,
+                func=self.insert_tick,
                 trigger="interval",
                 seconds=self.insert_interval,
                 id='twitter_data_insert',
@@ -91,6 +308,20 @@ class TwitterApp:
                 self.logger.error("Failed to initialize application")
                 return False
             
+            if self.worker_processes > 1 and self.worker_index is None:
+                # Workers open their own connections after the schema is in place
+                self.db_manager.disconnect()
+                self.run_workers()
+                return True
+            
+            if self.progress_queue is not None:
+                threading.Thread(target=self._report_progress, daemon=True).start()
+            
+            if self.load_mode == 'rate':
+                self.logger.info("Starting Twitter Data Generator in rate mode... Press Ctrl+C to exit")
+                self.run_rate_mode()
+                return True
+            
             self.setup_scheduler()
             
             self.logger.info("Starting Twitter Data Generator... Press Ctrl+C to exit")
@@ -113,6 +344,15 @@ class TwitterApp:
                 self.scheduler.shutdown(wait=False)
                 self.logger.info("Scheduler stopped")
             
+            if self.writer_pool is not None:
+                self.writer_pool.shutdown(wait=True)
+            
+            for worker in self.workers:
+                if worker.is_alive():
+                    worker.terminate()
+            for worker in self.workers:
+                worker.join(timeout=10)
+            
             self.db_manager.disconnect()
             
             self.logger.info("Application shutdown complete")
@@ -120,6 +360,11 @@ class TwitterApp:
         except Exception as e:
             self.logger.error(f"Error during shutdown: {e}")
 
+def run_worker(worker_index, progress_queue):
+    """Entry point of a generator worker process"""
+    app = TwitterApp(worker_index=worker_index, progress_queue=progress_queue)
+    app.start()
+
 def main():
     """Main entry point"""
     app = TwitterApp()
@@ -0,0 +1,306 @@
+import os
+import asyncio
+import logging
+import random
+import signal
+import psycopg
+from dotenv import load_dotenv
+from database_manager import DatabaseManager
+from workload_profiles import event_mix_from_env
+from data_generator import (
+    DataGenerator, TWEET_COLUMNS, TWEET_INSERT_SQL, FOLLOW_INSERT_SQL, FOLLOW_INSERT_WITH_COUNTS_SQL,
+    LIKE_INSERT_SQL, LIKE_INSERT_WITH_COUNTS_SQL, RETWEET_INSERT_SQL, TWEET_EDIT_SQL,
+    LOCK_USERS_SQL, LOCK_TWEETS_SQL
+)
+
+# psycopg 3 does not adapt tuples, so the shared statements get an explicit row placeholder
+TWEET_ROW_SQL = TWEET_INSERT_SQL.replace('VALUES %s', f"VALUES ({', '.join(['%s'] * len(TWEET_COLUMNS))})")
+FOLLOW_ROW_SQL = FOLLOW_INSERT_SQL.replace('VALUES %s', 'VALUES (%s, %s)')
+FOLLOW_ROW_WITH_COUNTS_SQL = FOLLOW_INSERT_WITH_COUNTS_SQL.replace('VALUES %s', 'VALUES (%s, %s)')
+LIKE_ROW_SQL = LIKE_INSERT_SQL.replace('VALUES %s', 'VALUES (%s, %s)')
+LIKE_ROW_WITH_COUNTS_SQL = LIKE_INSERT_WITH_COUNTS_SQL.replace('VALUES %s', 'VALUES (%s, %s)')
+RETWEET_ROW_SQL = RETWEET_INSERT_SQL.replace('VALUES %s', 'VALUES (%s, %s)')
+TWEET_EDIT_ROW_SQL = TWEET_EDIT_SQL.replace('VALUES %s', 'VALUES (%s, %s)')
+
+# Position of the tweet row each event kind locks (follows lock users instead)
+TWEET_LOCK_INDEX = {
+    'tweet': TWEET_COLUMNS.index('reply_to_tweet_id'),
+    'like': 1,
+    'retweet': 1,
+    'edit': 0,
+}
+
+
+class AsyncTwitterApp:
+    """High-throughput asyncio runtime that pipelines inserts over many connections"""
+    
+    def __init__(self):
+        self._setup_logging()
+        self._load_config()
+        self.db_manager = DatabaseManager()
+        self.data_generator = DataGenerator(self.db_manager)
+        self.stop_event = None
+        self._next_slot = 0.0
+        self.events_sent = 0
+        self.errors = 0
+        # Follow pairs queued in a pipeline that hasn't committed yet; they join the graph only on success
+        self.follows_in_flight = set()
+        self.event_kinds = list(self.event_mix)
+        self.event_weights = [self.event_mix[kind] for kind in self.event_kinds]
+    
+    def _setup_logging(self):
+        """Configure application logging"""
+        load_dotenv()
+        log_level = os.getenv('LOG_LEVEL', 'INFO').upper()
+        
+        logging.basicConfig(
+            level=getattr(logging, log_level),
+            format='%(asctime)s - %(levelname)s - %(name)s - %(message)s'
+        )
+        self.logger = logging.getLogger(__name__)
+    
+    def _load_config(self):
+        """Load runtime configuration from environment variables"""
+        self.target_rate = float(os.getenv('TARGET_EVENTS_PER_SECOND', '1000'))
+        self.concurrency = int(os.getenv('ASYNC_CONCURRENCY', '16'))
+        self.pipeline_depth = int(os.getenv('ASYNC_PIPELINE_DEPTH', '32'))
+        self.report_interval = float(os.getenv('ASYNC_REPORT_INTERVAL_SECONDS', '10'))
+        
+        # Unfollows, unlikes and deletes need a lookup before they know which rows to lock,
+        # which doesn't fit a pipeline; they stay with the synchronous generator
+        mix = event_mix_from_env()
+        skipped = sorted(set(mix) - set(TWEET_LOCK_INDEX) - {'follow'})
+        if skipped:
+            self.logger.info(f"Async runtime skips event types: {', '.join(skipped)}")
+        self.event_mix = {kind: weight for kind, weight in mix.items() if kind not in skipped}
+        if not self.event_mix:
+            raise ValueError("EVENT_MIX has no event types the async runtime supports")
+        
+        if self.target_rate <= 0:
+            raise ValueError(f"TARGET_EVENTS_PER_SECOND must be positive, got {self.target_rate}")
+        
+        self.logger.info(
+            f"Configured for {self.target_rate:g} events/s across {self.concurrency} connections "
+            f"(pipeline depth {self.pipeline_depth})"
+        )
+    
+    def initialize(self):
+        """Prepare schema and in-memory state with the synchronous manager"""
+        try:
+            self.logger.info("Initializing async Twitter Data Generator...")
+            
+            self.db_manager.connect()
+            self.db_manager.init_database()
+            self.data_generator.load_or_create_users()
+            self.data_generator.load_recent_tweet_ids()
+            self.data_generator.load_follow_graph()
+            self.data_generator.configure_counters()
+            
+            # Workers open their own async connections from here on
+            self.db_manager.disconnect()
+            
+            self.logger.info("Application initialized successfully")
+            return True
+        
+        except Exception as e:
+            self.logger.error(f"Error during initialization: {e}")
+            return False
+    
+    async def _acquire(self, count):
+        """Wait until count more events fit under the target rate"""
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        
+        # Don't let a stalled period turn into an unbounded catch-up burst
+        start = max(now - 1.0, self._next_slot)
+        self._next_slot = start + count / self.target_rate
+        
+        if start > now:
+            await asyncio.sleep(start - now)
+    
+    def _build_statement(self):
+        """Generate one random event as (kind, query, params)"""
+        generator = self.data_generator
+        kind = random.choices(self.event_kinds, weights=self.event_weights)[0]
+        
+        if kind == 'tweet':
+            tweet_data = generator.generate_tweet_data(offline=True)
+            return 'tweet', TWEET_ROW_SQL, tuple(tweet_data[column] for column in TWEET_COLUMNS)
+        
+        if kind == 'like':
+            like_data = generator.generate_like_data(offline=True)
+            if like_data is None:
+                return None
+            query = LIKE_ROW_WITH_COUNTS_SQL if generator.update_like_counts else LIKE_ROW_SQL
+            return 'like', query, (like_data['user_id'], like_data['tweet_id'])
+        
+        if kind == 'retweet':
+            retweet_data = generator.generate_retweet_data(offline=True)
+            if retweet_data is None:
+                return None
+            return 'retweet', RETWEET_ROW_SQL, (retweet_data['user_id'], retweet_data['original_tweet_id'])
+        
+        if kind == 'edit':
+            tweet_id = generator.recent_tweet_ids.sample()
+            if tweet_id is None:
+                return None
+            return 'edit', TWEET_EDIT_ROW_SQL, (tweet_id, generator.corpus.text(max_chars=280))
+        
+        follow_data = generator.generate_follow_data(offline=True)
+        if follow_data is None:
+            return None
+        follower_id, following_id = follow_data['follower_id'], follow_data['following_id']
+        if generator.follow_graph.contains(follower_id, following_id):
+            return None
+        if (follower_id, following_id) in self.follows_in_flight:
+            return None
+        
+        # Claim the pair so concurrent workers don't race on it until the pipeline settles
+        self.follows_in_flight.add((follower_id, following_id))
+        query = FOLLOW_ROW_WITH_COUNTS_SQL if generator.update_follow_counts else FOLLOW_ROW_SQL
+        return 'follow', query, (follower_id, following_id)
+    
+    async def _connect(self):
+        """Open an autocommit async connection with the manager's settings"""
+        config = self.db_manager.config
+        return await psycopg.AsyncConnection.connect(
+            host=config['host'],
+            port=config['port'],
+            dbname=config['database'],
+            user=config['user'],
+            password=config['password'],
+            autocommit=True
+        )
+    
+    async def _send_batch(self, conn):
+        """Generate one batch of events and send it as a single pipeline"""
+        statements = []
+        try:
+            for _ in range(self.pipeline_depth):
+                statement = self._build_statement()
+                if statement:
+                    statements.append(statement)
+            
+            # A pipeline runs as one implicit transaction, so lock every user and tweet row
+            # the counters will touch up front, users first and in ID order, to rule out deadlocks
+            locked_users = sorted({
+                user_id
+                for kind, _, params in statements if kind == 'follow'
+                for user_id in params
+            })
+            locked_tweets = sorted({
+                params[TWEET_LOCK_INDEX[kind]]
+                for kind, _, params in statements if kind != 'follow'
+            } - {None})
+            
+            cursors = []
+            async with conn.pipeline():
+                if locked_users:
+                    await conn.execute(LOCK_USERS_SQL, (locked_users,))
+                if locked_tweets:
+                    await conn.execute(LOCK_TWEETS_SQL, (locked_tweets,))
+                for kind, query, params in statements:
+                    cursor = conn.cursor()
+                    await cursor.execute(query, params)
+                    cursors.append((kind, cursor))
+            
+            for kind, cursor in cursors:
+                if kind == 'tweet':
+                    row = await cursor.fetchone()
+                    if row:
+                        self.data_generator.recent_tweet_ids.add(row[0])
+            
+            for kind, _, params in statements:
+                if kind == 'follow':
+                    self.data_generator.follow_graph.add(*params)
+            self.events_sent += len(statements)
+        finally:
+            # Pairs from a failed pipeline were never written, so they may be picked again
+            self.follows_in_flight.difference_update(
+                params for kind, _, params in statements if kind == 'follow'
+            )
+    
+    async def _worker(self, worker_id):
+        """Send pipelined batches of events on a dedicated connection until stopped"""
+        conn = None
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    if conn is None:
+                        conn = await self._connect()
+                    await self._acquire(self.pipeline_depth)
+                    await self._send_batch(conn)
+                
+                except psycopg.Error as e:
+                    self.errors += 1
+                    self.logger.error(f"Worker {worker_id} pipeline failed: {e}")
+                    if conn is None:
+                        # The connect itself failed; don't spin while the database is down
+                        await asyncio.sleep(1)
+                    else:
+                        # An aborted pipeline can leave client-side statement state out of sync
+                        await conn.close()
+                        conn = None
+                
+                except Exception as e:
+                    # Keep the worker alive; gather() at shutdown would otherwise hide its death
+                    self.errors += 1
+                    self.logger.error(f"Worker {worker_id} failed to send a batch: {e}")
+        finally:
+            if conn is not None:
+                await conn.close()
+    
+    async def _report(self):
+        """Periodically log achieved versus target throughput"""
+        loop = asyncio.get_running_loop()
+        last_time, last_count = loop.time(), self.events_sent
+        
+        while not self.stop_event.is_set():
+            try:
+                await asyncio.wait_for(self.stop_event.wait(), timeout=self.report_interval)
+            except asyncio.TimeoutError:
+                pass
+            
+            now, count = loop.time(), self.events_sent
+            achieved = (count - last_count) / (now - last_time)
+            self.logger.info(
+                f"Throughput: {achieved:.0f} events/s (target {self.target_rate:g}), "
+                f"{count} events total, {self.errors} failed pipelines"
+            )
+            last_time, last_count = now, count
+    
+    async def run(self):
+        """Run the workers and the throughput reporter until a stop signal arrives"""
+        self.stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self.stop_event.set)
+        
+        self._next_slot = loop.time()
+        tasks = [asyncio.create_task(self._worker(i)) for i in range(self.concurrency)]
+        tasks.append(asyncio.create_task(self._report()))
+        
+        await self.stop_event.wait()
+        self.logger.info("Interrupt signal received, shutting down gracefully...")
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.logger.info("Application shutdown complete")
+    
+    def start(self):
+        """Start the application"""
+        if not self.initialize():
+            self.logger.error("Failed to initialize application")
+            return False
+        
+        self.logger.info("Starting async Twitter Data Generator... Press Ctrl+C to exit")
+        asyncio.run(self.run())
+        return True
+
+
+def main():
+    """Async entry point"""
+    app = AsyncTwitterApp()
+    app.start()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,309 @@
+import os
 import logging
 import random
+import threading
+from array import array
+import numpy as np
 from faker import Faker
-from database_manager import DatabaseManager
+from database_manager import DatabaseManager, DatabaseUnavailableError
+from event_buffer import EventBuffer
+from id_sampler import RecentIdBuffer
+from follow_graph import FollowGraph
+from workload_profiles import event_mix_from_env
+from text_corpus import TextCorpus
+from distributions import ZipfSampler
+
+# Follower counters start at zero and are maintained by follow events
+USER_INSERT_SQL = """
+    INSERT INTO users (username, email, full_name, bio)
+    VALUES (%s, %s, %s, %s)
+    RETURNING user_id
+"""
+
+# Counters start at their defaults and are only ever changed by like/retweet/reply events
+TWEET_COLUMNS = (
+    'user_id', 'content', 'hashtags', 'mentions', 'reply_to_tweet_id', 'location'
+)
+
+FOLLOW_COUNT_TRIGGER = 'trigger_update_follow_counts'
+LIKE_COUNT_TRIGGER = 'trigger_update_likes_count'
+
+# Takes a VALUES %s list of TWEET_COLUMNS rows; replies bump their parent's
+# replies_count in the same statement (init.sql has no trigger for it)
+TWEET_INSERT_SQL = f"""
+    WITH inserted AS (
+        INSERT INTO tweets ({', '.join(TWEET_COLUMNS)})
+        VALUES %s
+        RETURNING tweet_id, reply_to_tweet_id
+    ),
+    deltas AS (
+        SELECT reply_to_tweet_id AS tweet_id, COUNT(*) AS replies
+        FROM inserted
+        WHERE reply_to_tweet_id IS NOT NULL
+        GROUP BY reply_to_tweet_id
+    ),
+    updated AS (
+        UPDATE tweets
+        SET replies_count = tweets.replies_count + deltas.replies
+        FROM deltas
+        WHERE tweets.tweet_id = deltas.tweet_id
+    )
+    SELECT tweet_id FROM inserted
+"""
+
+# Counterpart of TWEET_INSERT_SQL for COPY-loaded batches: VALUES %s of (tweet_id, replies)
+REPLY_COUNTS_SQL = """
+    UPDATE tweets
+    SET replies_count = tweets.replies_count + deltas.replies
+    FROM (VALUES %s) AS deltas (tweet_id, replies)
+    WHERE tweets.tweet_id = deltas.tweet_id
+"""
+
+# Both statements take a VALUES %s list of (follower_id, following_id) rows.
+# The unique constraint stays the source of truth for edges the in-memory index missed.
+FOLLOW_INSERT_SQL = """
+    INSERT INTO follows (follower_id, following_id)
+    VALUES %s
+    ON CONFLICT (follower_id, following_id) DO NOTHING
+    RETURNING follow_id
+"""
+
+# Taking the user row locks of a multi-row follow insert up front, in ID order,
+# keeps concurrent writers from deadlocking on the counter updates
+LOCK_USERS_SQL = """
+    SELECT 1 FROM users
+    WHERE user_id = ANY(%s)
+    ORDER BY user_id
+    FOR NO KEY UPDATE
+"""
+
+# Same for the tweet rows behind reply, like and retweet counters. Returns the IDs it locked,
+# so callers can tell which tweets were deleted in the meantime.
+LOCK_TWEETS_SQL = """
+    SELECT tweet_id FROM tweets
+    WHERE tweet_id = ANY(%s)
+    ORDER BY tweet_id
+    FOR NO KEY UPDATE
+"""
+
+# Deletes take full row locks; parents of deleted replies/retweets are locked the same way
+LOCK_TWEETS_FOR_DELETE_SQL = LOCK_TWEETS_SQL.replace('FOR NO KEY UPDATE', 'FOR UPDATE')
+
+# Without the init.sql trigger the counters are bumped by the same statement,
+# so the insert and both counter updates commit together in one transaction
+FOLLOW_INSERT_WITH_COUNTS_SQL = """
+    WITH inserted AS (
+        INSERT INTO follows (follower_id, following_id)
+        VALUES %s
+        ON CONFLICT (follower_id, following_id) DO NOTHING
+        RETURNING follow_id, follower_id, following_id
+    ),
+    deltas AS (
+        SELECT user_id, SUM(following_delta) AS following_delta, SUM(followers_delta) AS followers_delta
+        FROM (
+            SELECT follower_id AS user_id, 1 AS following_delta, 0 AS followers_delta FROM inserted
+            UNION ALL
+            SELECT following_id AS user_id, 0 AS following_delta, 1 AS followers_delta FROM inserted
+        ) AS edges
+        GROUP BY user_id
+    ),
+    updated AS (
+        UPDATE users
+        SET following_count = users.following_count + deltas.following_delta,
+            followers_count = users.followers_count + deltas.followers_delta
+        FROM deltas
+        WHERE users.user_id = deltas.user_id
+    )
+    SELECT follow_id FROM inserted
+"""
+
+# VALUES %s of (user_id, tweet_id) rows; liking a tweet twice is a no-op, and likes of tweets
+# deleted in the meantime are skipped instead of failing the whole batch on the foreign key
+LIKE_INSERT_SQL = """
+    INSERT INTO likes (user_id, tweet_id)
+    SELECT requested.user_id, requested.tweet_id
+    FROM (VALUES %s) AS requested (user_id, tweet_id)
+    WHERE EXISTS (SELECT 1 FROM tweets WHERE tweets.tweet_id = requested.tweet_id)
+    ON CONFLICT (user_id, tweet_id) DO NOTHING
+    RETURNING like_id
+"""
+
+LIKE_INSERT_WITH_COUNTS_SQL = """
+    WITH inserted AS (
+        INSERT INTO likes (user_id, tweet_id)
+        SELECT requested.user_id, requested.tweet_id
+        FROM (VALUES %s) AS requested (user_id, tweet_id)
+        WHERE EXISTS (SELECT 1 FROM tweets WHERE tweets.tweet_id = requested.tweet_id)
+        ON CONFLICT (user_id, tweet_id) DO NOTHING
+        RETURNING like_id, tweet_id
+    ),
+    deltas AS (
+        SELECT tweet_id, COUNT(*) AS likes FROM inserted GROUP BY tweet_id
+    ),
+    updated AS (
+        UPDATE tweets
+        SET likes_count = tweets.likes_count + deltas.likes
+        FROM deltas
+        WHERE tweets.tweet_id = deltas.tweet_id
+    )
+    SELECT like_id FROM inserted
+"""
+
+# VALUES %s of (user_id, original_tweet_id) rows. The retweet copies the original's
+# text and bumps its retweets_count; originals deleted in the meantime are skipped.
+RETWEET_INSERT_SQL = """
+    WITH requested (user_id, original_tweet_id) AS (
+        VALUES %s
+    ),
+    inserted AS (
+        INSERT INTO tweets (user_id, content, hashtags, mentions, is_retweet, original_tweet_id)
+        SELECT requested.user_id,
+               LEFT('RT @user_' || tweets.user_id || ': ' || tweets.content, 280),
+               tweets.hashtags,
+               ARRAY['@user_' || tweets.user_id],
+               TRUE,
+               tweets.tweet_id
+        FROM requested
+        JOIN tweets ON tweets.tweet_id = requested.original_tweet_id
+        RETURNING tweet_id, original_tweet_id
+    ),
+    deltas AS (
+        SELECT original_tweet_id AS tweet_id, COUNT(*) AS retweets
+        FROM inserted
+        GROUP BY original_tweet_id
+    ),
+    updated AS (
+        UPDATE tweets
+        SET retweets_count = tweets.retweets_count + deltas.retweets
+        FROM deltas
+        WHERE tweets.tweet_id = deltas.tweet_id
+    )
+    SELECT tweet_id FROM inserted
+"""
+
+# VALUES %s of (tweet_id, content) rows
+TWEET_EDIT_SQL = """
+    UPDATE tweets
+    SET content = edits.content
+    FROM (VALUES %s) AS edits (tweet_id, content)
+    WHERE tweets.tweet_id = edits.tweet_id
+    RETURNING tweets.tweet_id
+"""
+
+# Deleting replies and retweets takes them off their parents' counters. Likes go
+# with the tweet (ON DELETE CASCADE), and replies to it keep existing with a NULL parent.
+TWEET_DELETE_SQL = """
+    WITH deleted AS (
+        DELETE FROM tweets
+        WHERE tweet_id = ANY(%(tweet_ids)s)
+        RETURNING tweet_id, reply_to_tweet_id, original_tweet_id
+    ),
+    deltas AS (
+        SELECT tweet_id, SUM(replies) AS replies, SUM(retweets) AS retweets
+        FROM (
+            SELECT reply_to_tweet_id AS tweet_id, 1 AS replies, 0 AS retweets
+            FROM deleted WHERE reply_to_tweet_id IS NOT NULL
+            UNION ALL
+            SELECT original_tweet_id AS tweet_id, 0 AS replies, 1 AS retweets
+            FROM deleted WHERE original_tweet_id IS NOT NULL
+        ) AS parents
+        GROUP BY tweet_id
+    ),
+    updated AS (
+        UPDATE tweets
+        SET replies_count = tweets.replies_count - deltas.replies,
+            retweets_count = tweets.retweets_count - deltas.retweets
+        FROM deltas
+        WHERE tweets.tweet_id = deltas.tweet_id
+          AND tweets.tweet_id <> ALL(%(tweet_ids)s)
+    )
+    SELECT tweet_id FROM deleted
+"""
+
+TWEET_PARENTS_SQL = """
+    SELECT reply_to_tweet_id, original_tweet_id FROM tweets
+    WHERE tweet_id = ANY(%s)
+"""
+
+# Existing follows/likes are found by probing random points of the ID range, so
+# unfollows and unlikes need no in-memory copy of those tables; each probe is one index lookup
+FOLLOW_PROBE_SQL = """
+    SELECT DISTINCT follows.follow_id, follows.follower_id, follows.following_id
+    FROM unnest(%s::int[]) AS probe (id)
+    CROSS JOIN LATERAL (
+        SELECT follow_id, follower_id, following_id FROM follows
+        WHERE follow_id >= probe.id
+        ORDER BY follow_id
+        LIMIT 1
+    ) AS follows
+"""
+
+LIKE_PROBE_SQL = """
+    SELECT DISTINCT likes.like_id, likes.tweet_id
+    FROM unnest(%s::int[]) AS probe (id)
+    CROSS JOIN LATERAL (
+        SELECT like_id, tweet_id FROM likes
+        WHERE like_id >= probe.id
+        ORDER BY like_id
+        LIMIT 1
+    ) AS likes
+"""
+
+FOLLOW_DELETE_SQL = """
+    DELETE FROM follows
+    WHERE follow_id = ANY(%s)
+    RETURNING follower_id, following_id
+"""
+
+FOLLOW_DELETE_WITH_COUNTS_SQL = """
+    WITH deleted AS (
+        DELETE FROM follows
+        WHERE follow_id = ANY(%s)
+        RETURNING follower_id, following_id
+    ),
+    deltas AS (
+        SELECT user_id, SUM(following_delta) AS following_delta, SUM(followers_delta) AS followers_delta
+        FROM (
+            SELECT follower_id AS user_id, 1 AS following_delta, 0 AS followers_delta FROM deleted
+            UNION ALL
+            SELECT following_id AS user_id, 0 AS following_delta, 1 AS followers_delta FROM deleted
+        ) AS edges
+        GROUP BY user_id
+    ),
+    updated AS (
+        UPDATE users
+        SET following_count = users.following_count - deltas.following_delta,
+            followers_count = users.followers_count - deltas.followers_delta
+        FROM deltas
+        WHERE users.user_id = deltas.user_id
+    )
+    SELECT follower_id, following_id FROM deleted
+"""
+
+LIKE_DELETE_SQL = """
+    DELETE FROM likes
+    WHERE like_id = ANY(%s)
+    RETURNING like_id
+"""
+
+LIKE_DELETE_WITH_COUNTS_SQL = """
+    WITH deleted AS (
+        DELETE FROM likes
+        WHERE like_id = ANY(%s)
+        RETURNING like_id, tweet_id
+    ),
+    deltas AS (
+        SELECT tweet_id, COUNT(*) AS likes FROM deleted GROUP BY tweet_id
+    ),
+    updated AS (
+        UPDATE tweets
+        SET likes_count = tweets.likes_count - deltas.likes
+        FROM deltas
+        WHERE tweets.tweet_id = deltas.tweet_id
+    )
+    SELECT like_id FROM deleted
+"""
+
 
 class DataGenerator:
     """Generates realistic Twitter-like data"""
@@ -9,41 +311,255 @@ class DataGenerator:
     def __init__(self, db_manager: DatabaseManager):
         self.db_manager = db_manager
         self.fake = Faker()
-        self.user_ids = []
+        self.rng = np.random.default_rng()
+        self.partition_index, self.partition_count = 0, 1
+        self._user_sampler = None
+        self._sampler_rebuild = None
+        # Packed int32 IDs: 10M users take 40 MB instead of ~400 MB as a list of ints
+        self.user_ids = array('i')
+        self._user_ids_lock = threading.Lock()
+        self._load_config()
+        self.recent_tweet_ids = RecentIdBuffer(self.recent_tweet_buffer_size)
+        self.follow_graph = FollowGraph()
+        # Events generated while the database is down, replayed once it is back
+        self.pending = EventBuffer(self.outage_buffer_events)
+        self.corpus = TextCorpus(
+            self.fake,
+            sentences=self.corpus_sentences,
+            words=self.corpus_words,
+            names=self.corpus_names,
+            corpus_file=self.corpus_file
+        )
+        self.update_follow_counts = self.follow_counts_mode != 'trigger'
+        self.update_like_counts = self.like_counts_mode != 'trigger'
+        self._register_statements()
+    
+    def _register_statements(self):
+        """Register the fixed-shape statements of the hot paths as prepared statements"""
+        prepare = self.db_manager.prepare
+        one_tweet = f"VALUES ({', '.join(['%s'] * len(TWEET_COLUMNS))})"
+        one_pair = 'VALUES (%s, %s)'
+        
+        prepare('insert_user', USER_INSERT_SQL)
+        prepare('insert_tweet', TWEET_INSERT_SQL.replace('VALUES %s', one_tweet))
+        # Follows and likes are no-ops when the row already exists, so they are safe to retry
+        prepare('insert_follow', FOLLOW_INSERT_SQL.replace('VALUES %s', one_pair), idempotent=True)
+        prepare(
+            'insert_follow_with_counts', FOLLOW_INSERT_WITH_COUNTS_SQL.replace('VALUES %s', one_pair),
+            idempotent=True
+        )
+        # A bare VALUES list gives Postgres nothing to infer its column types from
+        pair_types = ('integer', 'integer')
+        prepare('insert_like', LIKE_INSERT_SQL.replace('VALUES %s', one_pair), pair_types, idempotent=True)
+        prepare(
+            'insert_like_with_counts', LIKE_INSERT_WITH_COUNTS_SQL.replace('VALUES %s', one_pair),
+            pair_types, idempotent=True
+        )
+        prepare('insert_retweet', RETWEET_INSERT_SQL.replace('VALUES %s', one_pair), pair_types)
+        prepare('lock_users', LOCK_USERS_SQL)
+        prepare('lock_tweets', LOCK_TWEETS_SQL)
+        prepare('lock_tweets_for_delete', LOCK_TWEETS_FOR_DELETE_SQL)
+        prepare('tweet_parents', TWEET_PARENTS_SQL)
+        prepare('delete_tweets', TWEET_DELETE_SQL)
+        prepare('probe_follows', FOLLOW_PROBE_SQL)
+        prepare('probe_likes', LIKE_PROBE_SQL)
+        prepare('delete_follows', FOLLOW_DELETE_SQL)
+        prepare('delete_follows_with_counts', FOLLOW_DELETE_WITH_COUNTS_SQL)
+        prepare('delete_likes', LIKE_DELETE_SQL)
+        prepare('delete_likes_with_counts', LIKE_DELETE_WITH_COUNTS_SQL)
+    
+    def _load_config(self):
+        """Load generator configuration from environment variables"""
+        # Tweets written per insert; 1 keeps the single-row INSERT path
+        self.tweet_batch_size = int(os.getenv('TWEET_BATCH_SIZE', '1'))
+        # Batches at least this large are loaded with COPY instead of a multi-row INSERT
+        self.copy_threshold = int(os.getenv('COPY_BATCH_THRESHOLD', '5000'))
+        # Recently inserted tweet IDs kept in memory as reply targets
+        self.recent_tweet_buffer_size = int(os.getenv('RECENT_TWEET_BUFFER_SIZE', '10000'))
+        # Who maintains users.followers_count/following_count: 'trigger' (db/init.sql),
+        # 'app' (the generator) or 'auto' (detect the trigger at startup)
+        self.follow_counts_mode = os.getenv('FOLLOW_COUNTS_MODE', 'auto').lower()
+        if self.follow_counts_mode not in ('auto', 'trigger', 'app'):
+            raise ValueError(f"Invalid FOLLOW_COUNTS_MODE: {self.follow_counts_mode}")
+        # Same choice for tweets.likes_count and its init.sql trigger
+        self.like_counts_mode = os.getenv('LIKE_COUNTS_MODE', 'auto').lower()
+        if self.like_counts_mode not in ('auto', 'trigger', 'app'):
+            raise ValueError(f"Invalid LIKE_COUNTS_MODE: {self.like_counts_mode}")
+        # Weights of the event types written by interval and rate mode (EVENT_MIX=tweet:0.6,...)
+        self.event_mix = event_mix_from_env()
+        # Power-law exponent for tweet authors, mention targets and follow targets;
+        # 0 keeps uniform picks, ~1 gives Zipf-like hot users
+        self.user_skew = float(os.getenv('USER_SKEW_EXPONENT', '0'))
+        # Pre-generated text pools; CORPUS_FILE supplies sentences (one per line) instead of Faker
+        self.corpus_sentences = int(os.getenv('CORPUS_SENTENCES', '20000'))
+        self.corpus_words = int(os.getenv('CORPUS_WORDS', '5000'))
+        self.corpus_names = int(os.getenv('CORPUS_NAMES', '5000'))
+        self.corpus_file = os.getenv('CORPUS_FILE') or None
+        # Events held in memory during a database outage; the oldest are dropped beyond this
+        self.outage_buffer_events = int(os.getenv('OUTAGE_BUFFER_EVENTS', '100000'))
+    
+    def seed(self, seed):
+        """Seed every random source used by the generator"""
+        random.seed(seed)
+        self.rng = np.random.default_rng(seed)
+        self.fake.seed_instance(seed)
+    
+    def set_partition(self, index, count):
+        """Restrict the generator to the users in slice index of count disjoint slices"""
+        if not 0 <= index < count:
+            raise ValueError(f"Invalid partition {index} of {count}")
+        self.partition_index, self.partition_count = index, count
+    
+    def _in_partition(self, user_id):
+        return user_id % self.partition_count == self.partition_index
+    
+    def _skewed_sampler(self):
+        """Zipf sampler over positions in user_ids, or None when picks are uniform"""
+        if self.user_skew <= 0:
+            return None
+        
+        n = len(self.user_ids)
+        sampler = self._user_sampler
+        if sampler is None or n < sampler.n:
+            # No table yet, or the user list was reloaded smaller: the old one could pick missing positions
+            sampler = self._user_sampler = ZipfSampler(n, self.user_skew)
+            logging.info(f"Built user popularity table for {n} users (exponent {self.user_skew:g})")
+        elif n > sampler.n * 1.1 and self._sampler_rebuild is None:
+            # Grown 10%: rebuild off the insert path and keep drawing from the old table (its
+            # positions stay valid) until the new one is swapped in; newer users join the tail
+            self._sampler_rebuild = threading.Thread(target=self._rebuild_sampler, args=(n,), daemon=True)
+            self._sampler_rebuild.start()
+        return sampler
+    
+    def _rebuild_sampler(self, n):
+        try:
+            sampler = ZipfSampler(n, self.user_skew)
+            # Skip the swap if the user list was reloaded smaller in the meantime
+            if n <= len(self.user_ids):
+                self._user_sampler = sampler
+            logging.info(f"Rebuilt user popularity table for {n} users (exponent {self.user_skew:g})")
+        except Exception as e:
+            logging.error(f"Failed to rebuild user popularity table: {e}")
+        finally:
+            self._sampler_rebuild = None
+    
+    def pick_user(self):
+        """Pick a user ID, skewed towards popular users if USER_SKEW_EXPONENT is set"""
+        sampler = self._skewed_sampler()
+        if sampler is None:
+            return random.choice(self.user_ids)
+        return self.user_ids[sampler.sample()]
+    
+    def pick_users(self, size):
+        """Vectorized pick_user(): a NumPy array of user IDs with the given shape"""
+        sampler = self._skewed_sampler()
+        # Zero-copy view; growing the array while a view is exported raises BufferError,
+        # so views and appends are serialized by the lock
+        with self._user_ids_lock:
+            user_ids = np.frombuffer(self.user_ids, dtype=np.int32)
+            if sampler is None:
+                picked = user_ids[self.rng.integers(0, len(user_ids), size)]
+            else:
+                picked = user_ids[sampler.sample_many(self.rng, size)]
+            del user_ids
+        return picked
+    
+    def add_users(self, user_ids):
+        """Append newly created user IDs to the in-memory user list"""
+        if self.partition_count > 1:
+            # A worker keeps users it creates outside its slice out of its list, so slices
+            # stay disjoint; they are still real users, picked up by their own slice on restart
+            user_ids = [user_id for user_id in user_ids if self._in_partition(user_id)]
+        with self._user_ids_lock:
+            self.user_ids.extend(user_ids)
+    
+    def ensure_partition_users(self, partition_count, minimum=2):
+        """Create users until every user_id % partition_count slice has at least minimum users,
+        so each worker can generate follows without creating users of its own"""
+        counts = self.db_manager.count_users_by_partition(partition_count)
+        # IDs come from a sequence, so new users cycle through the slices
+        attempts = partition_count * minimum * 2 + 20
+        while min(counts) < minimum and attempts > 0:
+            user_id = self.create_user()
+            attempts -= 1
+            if user_id:
+                counts[user_id % partition_count] += 1
+        if min(counts) < minimum:
+            raise RuntimeError(f"Could not give each of {partition_count} worker partitions {minimum} users")
+        logging.info(f"Every worker partition has at least {minimum} users ({min(counts)} in the smallest)")
     
     def load_or_create_users(self):
         """Load existing user IDs or create some initial users"""
         try:
-            self.user_ids = self.db_manager.get_user_ids()
+            # Workers only load their own user_id % partition_count slice
+            user_ids = self.db_manager.get_user_ids(self.partition_index, self.partition_count)
+            with self._user_ids_lock:
+                self.user_ids = user_ids
             
-            if self.user_ids:
+            if self.partition_count > 1:
+                # Workers never create their initial users; the parent fills every slice first
+                logging.info(f"Loaded {len(self.user_ids)} existing users of partition {self.partition_index}")
+                if len(self.user_ids) < 2:
+                    logging.warning("Fewer than 2 users in this partition, follows will be skipped")
+            elif self.user_ids:
                 logging.info(f"Loaded {len(self.user_ids)} existing users")
             else:
                 # Create some initial users
                 for _ in range(20):
                     user_id = self.create_user()
                     if user_id:
-                        self.user_ids.append(user_id)
+                        self.add_users((user_id,))
                 logging.info(f"Created {len(self.user_ids)} initial users")
                 
         except Exception as e:
             logging.error(f"Error loading/creating users: {e}")
     
+    def load_recent_tweet_ids(self):
+        """Seed the reply target buffer with the newest existing tweets"""
+        # Each worker only keeps tweets written by its own slice of users, so the tweets it
+        # edits and deletes are never in another worker's buffer of reply/like/retweet targets
+        tweet_ids = self.db_manager.get_recent_tweet_ids(
+            self.recent_tweet_buffer_size, self.partition_index, self.partition_count
+        )
+        self.recent_tweet_ids.extend(tweet_ids)
+        logging.info(f"Loaded {len(tweet_ids)} recent tweet IDs as reply targets")
+    
+    def load_follow_graph(self):
+        """Load existing follow edges so duplicate checks stay in memory"""
+        try:
+            # Follows are generated within a slice, so only its own edges can collide
+            pairs = self.db_manager.iter_follow_pairs(self.partition_index, self.partition_count)
+            self.follow_graph.load(pairs)
+            logging.info(f"Loaded {len(self.follow_graph)} existing follow relationships")
+        except Exception as e:
+            logging.error(f"Error loading follow graph: {e}")
+    
+    def configure_counters(self):
+        """Decide whether follow and like inserts must update the counters themselves"""
+        if self.follow_counts_mode == 'auto':
+            self.update_follow_counts = not self.db_manager.trigger_exists(
+                'follows', FOLLOW_COUNT_TRIGGER
+            )
+        if self.like_counts_mode == 'auto':
+            self.update_like_counts = not self.db_manager.trigger_exists(
+                'likes', LIKE_COUNT_TRIGGER
+            )
+        
+        for name, by_app in (("Follow", self.update_follow_counts), ("Like", self.update_like_counts)):
+            source = "application" if by_app else "database trigger"
+            logging.info(f"{name} counters maintained by {source}")
+    
     def create_user(self):
         """Create a new user and return user ID"""
         try:
-            username = self.fake.user_name()
-            email = self.fake.email()
-            full_name = self.fake.name()
-            bio = self.fake.text(max_nb_chars=160)
-            followers_count = random.randint(0, 1000)
-            following_count = random.randint(0, 500)
+            username = self.corpus.user_name()
+            email = self.corpus.email(username)
+            full_name = self.corpus.name()
+            bio = self.corpus.text(max_chars=160)
             
-            result = self.db_manager.execute_query("""
-                INSERT INTO users (username, email, full_name, bio, followers_count, following_count)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                RETURNING user_id
-            """, (username, email, full_name, bio, followers_count, following_count))
+            result = self.db_manager.execute_prepared(
+                'insert_user', (username, email, full_name, bio)
+            )
             
             user_id = result[0] if result else None
             if user_id:
@@ -55,141 +571,716 @@ class DataGenerator:
             logging.error(f"Error creating user: {e}")
             return None
     
-    def generate_tweet_data(self):
-        """Generate data for a new tweet"""
+    def create_users(self, count):
+        """Create count users with one multi-row insert and return the new user IDs"""
+        try:
+            rows = []
+            for _ in range(count):
+                username = self.corpus.user_name()
+                rows.append((
+                    username,
+                    self.corpus.email(username),
+                    self.corpus.name(),
+                    self.corpus.text(max_chars=160)
+                ))
+            
+            # Name collisions are skipped rather than failing the whole batch
+            result = self.db_manager.execute_values("""
+                INSERT INTO users (username, email, full_name, bio)
+                VALUES %s
+                ON CONFLICT DO NOTHING
+                RETURNING user_id
+            """, rows, page_size=max(count, 1), fetch=True)
+            
+            user_ids = [row[0] for row in result]
+            logging.info(f"Created batch of {len(user_ids)} users")
+            return user_ids
+            
+        except Exception as e:
+            logging.error(f"Error creating user batch: {e}")
+            return []
+    
+    def generate_tweet_data(self, offline=False):
+        """Generate data for a new tweet; offline=True only uses in-memory state, never the database"""
         # Ensure we have users
-        if not self.user_ids:
+        if not self.user_ids and not offline:
             self.load_or_create_users()
         
         # Sometimes create new users
-        if random.random() < 0.1:  # 10% chance
+        if not offline and random.random() < 0.1:  # 10% chance
             new_user_id = self.create_user()
             if new_user_id:
-                self.user_ids.append(new_user_id)
+                self.add_users((new_user_id,))
         
-        user_id = random.choice(self.user_ids)
-        content = self.fake.text(max_nb_chars=280)
+        user_id = self.pick_user()
+        content = self.corpus.text(max_chars=280)
         
         # Generate hashtags
         hashtags = []
         if random.random() < 0.3:  # 30% chance of hashtags
-            hashtags = [f"#{self.fake.word()}" for _ in range(random.randint(1, 3))]
+            hashtags = [f"#{self.corpus.word()}" for _ in range(random.randint(1, 3))]
         
         # Generate mentions
         mentions = []
         if random.random() < 0.2:  # 20% chance of mentions
-            mention_users = random.sample(self.user_ids, min(2, len(self.user_ids)))
+            mention_users = dict.fromkeys(self.pick_user() for _ in range(min(2, len(self.user_ids))))
             mentions = [f"@user_{uid}" for uid in mention_users if uid != user_id]
         
-        likes_count = random.randint(0, 1000)
-        retweets_count = random.randint(0, 100)
-        
         # Sometimes make it a reply (20% chance)
         reply_to_tweet_id = None
         if random.random() < 0.2:
-            reply_to_tweet_id = self.db_manager.get_random_tweet_id()
+            reply_to_tweet_id = self.recent_tweet_ids.sample()
+            if reply_to_tweet_id is None and not offline:
+                reply_to_tweet_id = self.db_manager.get_random_tweet_id()
+        
+        # Geotag 40% of tweets
+        location = self.corpus.location() if random.random() < 0.4 else None
         
         return {
             'user_id': user_id,
             'content': content,
             'hashtags': hashtags,
             'mentions': mentions,
-            'likes_count': likes_count,
-            'retweets_count': retweets_count,
-            'reply_to_tweet_id': reply_to_tweet_id
+            'reply_to_tweet_id': reply_to_tweet_id,
+            'location': location
         }
     
-    def generate_follow_data(self):
-        """Generate data for a new follow relationship"""
+    def generate_follow_data(self, offline=False):
+        """Generate data for a new follow relationship, or None with fewer than two users;
+        offline=True never touches the database"""
         # Ensure we have enough users
-        if len(self.user_ids) < 2:
+        if len(self.user_ids) < 2 and not offline:
             self.load_or_create_users()
         
         # Sometimes create new users
-        if random.random() < 0.05:  # 5% chance
+        if not offline and random.random() < 0.05:  # 5% chance
             new_user_id = self.create_user()
             if new_user_id:
-                self.user_ids.append(new_user_id)
+                self.add_users((new_user_id,))
+        
+        n = len(self.user_ids)
+        if n < 2:
+            return None
         
-        # Select two different users
-        follower_id, following_id = random.sample(self.user_ids, 2)
+        # Select two different users; with skew, popular users attract most follows
+        sampler = self._skewed_sampler()
+        if sampler is not None:
+            # Draw the follower from the other n - 1 positions, skipping over the followed user's
+            following_index = sampler.sample()
+            follower_index = random.randrange(n - 1)
+            if follower_index >= following_index:
+                follower_index += 1
+            follower_id, following_id = self.user_ids[follower_index], self.user_ids[following_index]
+        else:
+            follower_id, following_id = random.sample(self.user_ids, 2)
         
         return {
             'follower_id': follower_id,
             'following_id': following_id
         }
     
+    def _engagement_target(self, offline):
+        """Pick a recent tweet to like or retweet, falling back to the database when online"""
+        tweet_id = self.recent_tweet_ids.sample()
+        if tweet_id is None and not offline:
+            tweet_id = self.db_manager.get_random_tweet_id()
+        return tweet_id
+    
+    def generate_like_data(self, offline=False):
+        """Generate data for a new like, or None if there is no tweet to like yet"""
+        tweet_id = self._engagement_target(offline)
+        if tweet_id is None or not self.user_ids:
+            return None
+        
+        return {
+            'user_id': random.choice(self.user_ids),
+            'tweet_id': tweet_id
+        }
+    
+    def generate_retweet_data(self, offline=False):
+        """Generate data for a new retweet, or None if there is no tweet to retweet yet"""
+        original_tweet_id = self._engagement_target(offline)
+        if original_tweet_id is None or not self.user_ids:
+            return None
+        
+        return {
+            'user_id': random.choice(self.user_ids),
+            'original_tweet_id': original_tweet_id
+        }
+    
     def insert_tweet(self):
-        """Insert a new tweet into the database"""
-        try:
-            tweet_data = self.generate_tweet_data()
-            
-            result = self.db_manager.execute_query("""
-                INSERT INTO tweets (user_id, content, hashtags, mentions, likes_count, retweets_count, reply_to_tweet_id)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-                RETURNING tweet_id
-            """, (
-                tweet_data['user_id'],
-                tweet_data['content'],
-                tweet_data['hashtags'],
-                tweet_data['mentions'],
-                tweet_data['likes_count'],
-                tweet_data['retweets_count'],
-                tweet_data['reply_to_tweet_id']
-            ))
+        """Insert a new tweet into the database and return how many were written (0 or 1)"""
+        rows = []
+        try:
+            tweet_data = self.generate_tweet_data(offline=not self.db_manager.available)
+            rows = [tuple(tweet_data[column] for column in TWEET_COLUMNS)]
+            
+            parent_id = tweet_data['reply_to_tweet_id']
+            with self.db_manager.transaction():
+                if parent_id is not None:
+                    # As in _write_tweets, a parent deleted in the meantime makes this a plain tweet
+                    if not self.db_manager.execute_prepared('lock_tweets', ([parent_id],), fetch=True):
+                        tweet_data['reply_to_tweet_id'] = None
+                        rows = [tuple(tweet_data[column] for column in TWEET_COLUMNS)]
+                result = self.db_manager.execute_prepared('insert_tweet', rows[0])
             
             tweet_id = result[0] if result else None
             if tweet_id:
+                self.recent_tweet_ids.add(tweet_id)
                 logging.info(f"Inserted tweet ID: {tweet_id} by user {tweet_data['user_id']}")
+                return 1
             
+        except DatabaseUnavailableError as e:
+            self._hold_back('tweet', rows, e)
         except Exception as e:
             logging.error(f"Error inserting tweet: {e}")
+        return 0
+    
+    def generate_tweet_batch(self, count, offline=False):
+        """Generate count tweets at once as columnar arrays keyed by TWEET_COLUMNS"""
+        rng = self.rng
+        
+        if not offline:
+            if not self.user_ids:
+                self.load_or_create_users()
+            # Same 10% new-user rate as generate_tweet_data, created in a single insert
+            new_users = int(rng.binomial(count, 0.1))
+            if new_users:
+                self.add_users(self.create_users(new_users))
+        
+        authors = self.pick_users(count)
+        
+        # Hashtags: 30% of tweets carry 1-3 words from the corpus
+        hashtag_counts = np.where(rng.random(count) < 0.3, rng.integers(1, 4, count), 0)
+        words = self.corpus.words
+        tags = [f"#{words[i]}" for i in rng.integers(0, len(words), int(hashtag_counts.sum())).tolist()]
+        ends = np.cumsum(hashtag_counts).tolist()
+        hashtags = [tags[end - n:end] for n, end in zip(hashtag_counts.tolist(), ends)]
+        
+        # Mentions: 20% of tweets mention up to two other users
+        mention_targets = self.pick_users((count, 2))
+        has_mentions = rng.random(count) < 0.2
+        mentions = [
+            [f"@user_{uid}" for uid in dict.fromkeys(targets) if uid != author] if mention else []
+            for author, targets, mention in zip(authors.tolist(), mention_targets.tolist(), has_mentions.tolist())
+        ]
+        
+        # Replies: 20% of tweets answer a recently inserted tweet
+        is_reply = (rng.random(count) < 0.2).tolist()
+        reply_targets = self.recent_tweet_ids.sample_many(sum(is_reply))
+        reply_iter = iter(reply_targets)
+        reply_to_tweet_ids = [next(reply_iter, None) if reply else None for reply in is_reply]
+        
+        # Locations: 40% of tweets are geotagged
+        locations = self.corpus.locations
+        location_ids = np.where(rng.random(count) < 0.4, rng.integers(0, len(locations), count), -1)
+        
+        return {
+            'user_id': authors.tolist(),
+            'content': self.corpus.texts(count, 280, rng),
+            'hashtags': hashtags,
+            'mentions': mentions,
+            'reply_to_tweet_id': reply_to_tweet_ids,
+            'location': [locations[i] if i >= 0 else None for i in location_ids.tolist()]
+        }
+    
+    def insert_tweets(self, count):
+        """Insert a batch of tweets in one round trip and return their IDs"""
+        rows = []
+        try:
+            # New users need the database, so none are created while it is down
+            columns = self.generate_tweet_batch(count, offline=not self.db_manager.available)
+            rows = list(zip(*(columns[column] for column in TWEET_COLUMNS)))
+            return self._write_tweets(rows)
+            
+        except DatabaseUnavailableError as e:
+            self._hold_back('tweet', rows, e)
+            return []
+        except Exception as e:
+            logging.error(f"Error inserting tweet batch: {e}")
+            return []
+    
+    def _write_tweets(self, rows):
+        """Write TWEET_COLUMNS rows, bump their parents' reply counters and return the new IDs"""
+        count = len(rows)
+        if not count:
+            return []
+        
+        reply_index = TWEET_COLUMNS.index('reply_to_tweet_id')
+        replies = {}
+        for row in rows:
+            parent_id = row[reply_index]
+            if parent_id is not None:
+                replies[parent_id] = replies.get(parent_id, 0) + 1
+        
+        with self.db_manager.transaction():
+            if replies:
+                locked = self.db_manager.execute_prepared('lock_tweets', (sorted(replies),), fetch=True)
+                # Parents deleted since they were sampled would fail the foreign key and take
+                # the whole batch with them; the lock keeps the others in place until commit
+                vanished = set(replies) - {row['tweet_id'] for row in locked}
+                if vanished:
+                    rows = [
+                        row[:reply_index] + (None,) + row[reply_index + 1:] if row[reply_index] in vanished else row
+                        for row in rows
+                    ]
+                    replies = {parent_id: n for parent_id, n in replies.items() if parent_id not in vanished}
+            
+            if count >= self.copy_threshold:
+                # COPY cannot return generated keys, so draw them from the sequence up front
+                tweet_ids = self.db_manager.reserve_ids('tweets', 'tweet_id', count)
+                self.db_manager.copy_rows(
+                    'tweets',
+                    ('tweet_id',) + TWEET_COLUMNS,
+                    [(tweet_id,) + row for tweet_id, row in zip(tweet_ids, rows)]
+                )
+                if replies:
+                    self.db_manager.execute_values(
+                        REPLY_COUNTS_SQL, list(replies.items()), page_size=len(replies),
+                        kind='update_reply_counts'
+                    )
+            else:
+                result = self.db_manager.execute_values(
+                    TWEET_INSERT_SQL, rows, page_size=count, fetch=True
+                )
+                tweet_ids = [row[0] for row in result]
+        
+        self.recent_tweet_ids.extend(tweet_ids)
+        logging.info(f"Inserted batch of {len(tweet_ids)} tweets")
+        return tweet_ids
     
     def insert_follow(self):
-        """Insert a new follow relationship into the database"""
+        """Insert a new follow relationship into the database and return how many were written (0 or 1)"""
+        rows = []
         try:
-            follow_data = self.generate_follow_data()
+            follow_data = self.generate_follow_data(offline=not self.db_manager.available)
+            if follow_data is None:
+                logging.info("Not enough users to create a follow relationship")
+                return 0
             
             # Check if relationship already exists
-            if self.db_manager.check_follow_exists(
+            if self.follow_graph.contains(
                 follow_data['follower_id'], 
                 follow_data['following_id']
             ):
                 logging.info(f"Follow relationship already exists between users {follow_data['follower_id']} and {follow_data['following_id']}")
-                return
+                return 0
+            
+            rows = [(follow_data['follower_id'], follow_data['following_id'])]
+            statement = 'insert_follow_with_counts' if self.update_follow_counts else 'insert_follow'
+            # Same ordered user locks as _write_follows: the counter updates (ours or the
+            # init.sql trigger's) touch both users, so A->B and B->A could otherwise deadlock
+            with self.db_manager.transaction():
+                self.db_manager.execute_prepared('lock_users', (sorted(rows[0]),), fetch=True)
+                result = self.db_manager.execute_prepared(statement, rows[0])
             
-            result = self.db_manager.execute_query("""
-                INSERT INTO follows (follower_id, following_id)
-                VALUES (%s, %s)
-                RETURNING follow_id
-            """, (follow_data['follower_id'], follow_data['following_id']))
+            self.follow_graph.add(follow_data['follower_id'], follow_data['following_id'])
             
             follow_id = result[0] if result else None
             if follow_id:
-                # Update follower/following counts
-                self.db_manager.execute_query("""
-                    UPDATE users SET following_count = following_count + 1
-                    WHERE user_id = %s
-                """, (follow_data['follower_id'],))
-                
-                self.db_manager.execute_query("""
-                    UPDATE users SET followers_count = followers_count + 1
-                    WHERE user_id = %s
-                """, (follow_data['following_id'],))
-                
                 logging.info(f"Inserted follow relationship ID: {follow_id} (User {follow_data['follower_id']} follows User {follow_data['following_id']})")
+                return 1
             
+        except DatabaseUnavailableError as e:
+            self._hold_back('follow', rows, e)
         except Exception as e:
             logging.error(f"Error inserting follow relationship: {e}")
+        return 0
+    
+    def insert_follows(self, count):
+        """Insert a batch of follow relationships in one statement and return how many were new"""
+        pairs = []
+        try:
+            if self.db_manager.available:
+                if len(self.user_ids) < 2:
+                    self.load_or_create_users()
+                # Same 5% new-user rate as generate_follow_data, created in a single insert
+                new_users = int(self.rng.binomial(count, 0.05))
+                if new_users:
+                    self.add_users(self.create_users(new_users))
+            
+            batch_keys = set()
+            for _ in range(count):
+                follow_data = self.generate_follow_data(offline=True)
+                if follow_data is None:
+                    break
+                pair = (follow_data['follower_id'], follow_data['following_id'])
+                if pair in batch_keys or self.follow_graph.contains(*pair):
+                    continue
+                batch_keys.add(pair)
+                pairs.append(pair)
+            
+            return self._write_follows(pairs)
+            
+        except DatabaseUnavailableError as e:
+            self._hold_back('follow', pairs, e)
+            return 0
+        except Exception as e:
+            logging.error(f"Error inserting follow batch: {e}")
+            return 0
+    
+    def _write_follows(self, pairs):
+        """Write (follower_id, following_id) pairs and return how many were new"""
+        if not pairs:
+            return 0
+        
+        query = FOLLOW_INSERT_WITH_COUNTS_SQL if self.update_follow_counts else FOLLOW_INSERT_SQL
+        with self.db_manager.transaction():
+            self.db_manager.execute_prepared(
+                'lock_users',
+                (sorted({user_id for pair in pairs for user_id in pair}),),
+                fetch=True
+            )
+            result = self.db_manager.execute_values(query, pairs, page_size=len(pairs), fetch=True)
+        
+        for pair in pairs:
+            self.follow_graph.add(*pair)
+        
+        logging.info(f"Inserted batch of {len(result)} follow relationships")
+        return len(result)
+    
+    def insert_like(self):
+        """Insert a new like into the database and return how many were written (0 or 1)"""
+        rows = []
+        try:
+            like_data = self.generate_like_data(offline=not self.db_manager.available)
+            if like_data is None:
+                return 0
+            
+            rows = [(like_data['user_id'], like_data['tweet_id'])]
+            statement = 'insert_like_with_counts' if self.update_like_counts else 'insert_like'
+            result = self.db_manager.execute_prepared(statement, rows[0])
+            
+            if result:
+                logging.info(f"Inserted like ID: {result[0]} (User {like_data['user_id']} likes tweet {like_data['tweet_id']})")
+                return 1
+            
+        except DatabaseUnavailableError as e:
+            self._hold_back('like', rows, e)
+        except Exception as e:
+            logging.error(f"Error inserting like: {e}")
+        return 0
+    
+    def insert_likes(self, count):
+        """Insert a batch of likes in one statement and return how many were new"""
+        pairs = []
+        try:
+            offline = not self.db_manager.available
+            unique_pairs = set()
+            for _ in range(count):
+                like_data = self.generate_like_data(offline)
+                if like_data is None:
+                    break
+                unique_pairs.add((like_data['user_id'], like_data['tweet_id']))
+            
+            pairs = list(unique_pairs)
+            return self._write_likes(pairs)
+            
+        except DatabaseUnavailableError as e:
+            self._hold_back('like', pairs, e)
+            return 0
+        except Exception as e:
+            logging.error(f"Error inserting like batch: {e}")
+            return 0
+    
+    def _write_likes(self, pairs):
+        """Write (user_id, tweet_id) pairs and return how many were new"""
+        if not pairs:
+            return 0
+        
+        query = LIKE_INSERT_WITH_COUNTS_SQL if self.update_like_counts else LIKE_INSERT_SQL
+        with self.db_manager.transaction():
+            self.db_manager.execute_prepared(
+                'lock_tweets', (sorted({tweet_id for _, tweet_id in pairs}),), fetch=True
+            )
+            result = self.db_manager.execute_values(query, pairs, page_size=len(pairs), fetch=True)
+        
+        logging.info(f"Inserted batch of {len(result)} likes")
+        return len(result)
+    
+    def insert_retweet(self):
+        """Insert a retweet of a recent tweet into the database and return how many were written (0 or 1)"""
+        rows = []
+        try:
+            retweet_data = self.generate_retweet_data(offline=not self.db_manager.available)
+            if retweet_data is None:
+                return 0
+            
+            rows = [(retweet_data['user_id'], retweet_data['original_tweet_id'])]
+            result = self.db_manager.execute_prepared('insert_retweet', rows[0])
+            
+            # Retweets are not added to the reply/retweet targets, so chains stay one level deep
+            if result:
+                logging.info(f"Inserted retweet ID: {result[0]} of tweet {retweet_data['original_tweet_id']} by user {retweet_data['user_id']}")
+                return 1
+            
+        except DatabaseUnavailableError as e:
+            self._hold_back('retweet', rows, e)
+        except Exception as e:
+            logging.error(f"Error inserting retweet: {e}")
+        return 0
+    
+    def insert_retweets(self, count):
+        """Insert a batch of retweets in one statement and return how many were written"""
+        rows = []
+        try:
+            offline = not self.db_manager.available
+            for _ in range(count):
+                retweet_data = self.generate_retweet_data(offline)
+                if retweet_data is None:
+                    break
+                rows.append((retweet_data['user_id'], retweet_data['original_tweet_id']))
+            
+            return self._write_retweets(rows)
+            
+        except DatabaseUnavailableError as e:
+            self._hold_back('retweet', rows, e)
+            return 0
+        except Exception as e:
+            logging.error(f"Error inserting retweet batch: {e}")
+            return 0
+    
+    def _write_retweets(self, rows):
+        """Write (user_id, original_tweet_id) retweets and return how many were written"""
+        if not rows:
+            return 0
+        
+        with self.db_manager.transaction():
+            self.db_manager.execute_prepared(
+                'lock_tweets', (sorted({tweet_id for _, tweet_id in rows}),), fetch=True
+            )
+            result = self.db_manager.execute_values(
+                RETWEET_INSERT_SQL, rows, page_size=len(rows), fetch=True, kind='insert_retweets'
+            )
+        
+        logging.info(f"Inserted batch of {len(result)} retweets")
+        return len(result)
+    
+    def _probe_ids(self, table, column, count):
+        """Draw up to count distinct random probe points inside the ID range of table"""
+        id_range = self.db_manager.get_id_range(table, column)
+        if id_range is None:
+            return []
+        low, high = id_range
+        return sorted(set(self.rng.integers(low, high + 1, count).tolist()))
+    
+    def edit_tweets(self, count):
+        """Rewrite the content of count recent tweets and return how many were updated"""
+        rows = []
+        try:
+            tweet_ids = sorted(set(self.recent_tweet_ids.sample_many(count)))
+            rows = list(zip(tweet_ids, self.corpus.texts(len(tweet_ids), 280, self.rng)))
+            return self._write_edits(rows)
+            
+        except DatabaseUnavailableError as e:
+            self._hold_back('edit', rows, e)
+            return 0
+        except Exception as e:
+            logging.error(f"Error editing tweet batch: {e}")
+            return 0
+    
+    def _write_edits(self, rows):
+        """Apply (tweet_id, content) edits and return how many tweets were updated"""
+        if not rows:
+            return 0
+        
+        with self.db_manager.transaction():
+            self.db_manager.execute_prepared(
+                'lock_tweets', (sorted({tweet_id for tweet_id, _ in rows}),), fetch=True
+            )
+            result = self.db_manager.execute_values(
+                TWEET_EDIT_SQL, rows, page_size=len(rows), fetch=True, kind='edit_tweets'
+            )
+        
+        logging.info(f"Edited batch of {len(result)} tweets")
+        return len(result)
+    
+    def delete_tweets(self, count):
+        """Delete count recent tweets and return how many were deleted"""
+        # Deletes aren't buffered during an outage; they pause until the database is back
+        if not self.db_manager.available:
+            return 0
+        
+        try:
+            tweet_ids = sorted(set(self.recent_tweet_ids.sample_many(count)))
+            if not tweet_ids:
+                return 0
+            
+            # Stop replying to, liking and retweeting them even if the delete fails
+            self.recent_tweet_ids.discard(tweet_ids)
+            
+            with self.db_manager.transaction():
+                parents = self.db_manager.execute_prepared('tweet_parents', (tweet_ids,), fetch=True)
+                locked = set(tweet_ids)
+                for row in parents:
+                    locked.update(parent for parent in row.values() if parent is not None)
+                self.db_manager.execute_prepared('lock_tweets_for_delete', (sorted(locked),), fetch=True)
+                result = self.db_manager.execute_prepared(
+                    'delete_tweets', {'tweet_ids': tweet_ids}, fetch=True
+                )
+            
+            logging.info(f"Deleted batch of {len(result)} tweets")
+            return len(result)
+            
+        except Exception as e:
+            logging.error(f"Error deleting tweet batch: {e}")
+            return 0
+    
+    def delete_follows(self, count):
+        """Unfollow up to count random existing follow relationships and return how many were removed"""
+        if not self.db_manager.available:
+            return 0
+        
+        try:
+            probes = self._probe_ids('follows', 'follow_id', count)
+            if not probes:
+                return 0
+            
+            with self.db_manager.transaction():
+                follows = self.db_manager.execute_prepared('probe_follows', (probes,), fetch=True)
+                # Workers only touch edges of their own followers, like inserts do
+                follows = [row for row in follows if self._in_partition(row['follower_id'])]
+                if not follows:
+                    return 0
+                
+                self.db_manager.execute_prepared(
+                    'lock_users',
+                    (sorted({row[column] for row in follows for column in ('follower_id', 'following_id')}),),
+                    fetch=True
+                )
+                statement = 'delete_follows_with_counts' if self.update_follow_counts else 'delete_follows'
+                result = self.db_manager.execute_prepared(
+                    statement, ([row['follow_id'] for row in follows],), fetch=True
+                )
+            
+            for row in result:
+                self.follow_graph.discard(row['follower_id'], row['following_id'])
+            
+            logging.info(f"Deleted batch of {len(result)} follow relationships")
+            return len(result)
+            
+        except Exception as e:
+            logging.error(f"Error deleting follow batch: {e}")
+            return 0
+    
+    def delete_likes(self, count):
+        """Remove up to count random existing likes and return how many were removed"""
+        if not self.db_manager.available:
+            return 0
+        
+        try:
+            probes = self._probe_ids('likes', 'like_id', count)
+            if not probes:
+                return 0
+            
+            with self.db_manager.transaction():
+                likes = self.db_manager.execute_prepared('probe_likes', (probes,), fetch=True)
+                if not likes:
+                    return 0
+                
+                self.db_manager.execute_prepared(
+                    'lock_tweets', (sorted({row['tweet_id'] for row in likes}),), fetch=True
+                )
+                statement = 'delete_likes_with_counts' if self.update_like_counts else 'delete_likes'
+                result = self.db_manager.execute_prepared(
+                    statement, ([row['like_id'] for row in likes],), fetch=True
+                )
+            
+            logging.info(f"Deleted batch of {len(result)} likes")
+            return len(result)
+            
+        except Exception as e:
+            logging.error(f"Error deleting like batch: {e}")
+            return 0
+    
+    def _hold_back(self, kind, rows, error):
+        """Buffer events that could not be written because the database is unreachable"""
+        if rows:
+            self.pending.add(kind, rows)
+            logging.debug(f"Holding back {len(rows)} {kind} events ({len(self.pending)} buffered): {error}")
+    
+    def flush_pending(self):
+        """Replay events buffered during a database outage and return how many were written"""
+        writers = {
+            'tweet': lambda rows: len(self._write_tweets(rows)),
+            'follow': self._write_follows,
+            'like': self._write_likes,
+            'retweet': self._write_retweets,
+            'edit': self._write_edits,
+        }
+        replayed = written = 0
+        while True:
+            batch = self.pending.pop()
+            if batch is None:
+                break
+            kind, rows = batch
+            try:
+                written += writers[kind](rows)
+            except DatabaseUnavailableError:
+                # Still down; keep the batch first in line for the next attempt
+                self.pending.requeue(kind, rows)
+                break
+            except Exception as e:
+                logging.error(f"Error replaying {len(rows)} buffered {kind} events: {e}")
+            replayed += len(rows)
+        
+        if replayed:
+            logging.info(
+                f"Replayed {replayed} buffered events ({written} written, "
+                f"{self.pending.dropped} dropped so far because the buffer was full)"
+            )
+        return written
+    
+    def insert_random_batch(self, count, mix=None):
+        """Write count random events as batched statements and return how many were written"""
+        mix = mix or self.event_mix
+        inserters = {
+            'tweet': lambda n: len(self.insert_tweets(n)),
+            'follow': self.insert_follows,
+            'like': self.insert_likes,
+            'retweet': self.insert_retweets,
+            'edit': self.edit_tweets,
+            'unfollow': self.delete_follows,
+            'unlike': self.delete_likes,
+            'delete': self.delete_tweets,
+        }
+        unknown = set(mix) - set(inserters)
+        if unknown:
+            raise ValueError(f"Unknown event types in mix: {', '.join(sorted(unknown))}")
+        
+        # Draw the event type of every event from the mix weights, then batch per type
+        kinds = list(mix)
+        counts = dict.fromkeys(kinds, 0)
+        for kind in random.choices(kinds, weights=[mix[kind] for kind in kinds], k=count):
+            counts[kind] += 1
+        
+        written = self.flush_pending() if len(self.pending) else 0
+        return written + sum(inserters[kind](n) for kind, n in counts.items() if n)
     
     def insert_random_data(self):
-        """Insert random data - sometimes tweet, sometimes follow"""
+        """Write one random event drawn from the event mix and return how many events were written"""
+        written = 0
         try:
-            # 70% chance to insert tweet, 30% chance to insert follow
-            if random.random() < 0.7:
-                self.insert_tweet()
+            if len(self.pending):
+                written += self.flush_pending()
+            
+            kinds = list(self.event_mix)
+            kind = random.choices(kinds, weights=[self.event_mix[k] for k in kinds])[0]
+            if kind == 'tweet':
+                if self.tweet_batch_size > 1:
+                    written += len(self.insert_tweets(self.tweet_batch_size))
+                else:
+                    written += self.insert_tweet()
+            elif kind == 'follow':
+                written += self.insert_follow()
+            elif kind == 'like':
+                written += self.insert_like()
+            elif kind == 'retweet':
+                written += self.insert_retweet()
             else:
-                self.insert_follow()
+                # Updates and deletes have no separate single-row path
+                written += self.insert_random_batch(1, {kind: 1})
                 
         except Exception as e:
-            logging.error(f"Error in random data insert: {e}")
\ No newline at end of file
+            logging.error(f"Error in random data insert: {e}")
+        return written
\ No newline at end of file
@@ -1,15 +1,61 @@
+import io
 import os
+import re
+import csv
+import time
+import random
 import logging
+import threading
+from array import array
+from contextlib import contextmanager
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool, PoolError
+from psycopg2.extras import RealDictCursor, execute_values
 from dotenv import load_dotenv
+from query_metrics import QueryMetrics
+
+# psycopg2 placeholders, rewritten as $n parameters for PREPARE
+_PLACEHOLDER = re.compile(r"%\((\w+)\)s|%s|%%")
+
+# First table a statement writes to or reads from; names ad-hoc statements in the query metrics
+_STATEMENT_TARGET = re.compile(r"\b(INSERT\s+INTO|UPDATE|DELETE\s+FROM|FROM)\s+(\w+)", re.IGNORECASE)
+
+# Probe a random point in the ID range; min/max and the probe are all
+# index lookups, so this stays cheap however large the table grows
+RANDOM_TWEET_ID_SQL = """
+    SELECT tweet_id FROM tweets
+    WHERE tweet_id >= (
+        SELECT min(tweet_id) + floor(random() * (max(tweet_id) - min(tweet_id) + 1))::int
+        FROM tweets
+    )
+    ORDER BY tweet_id
+    LIMIT 1
+"""
+
+class DatabaseUnavailableError(Exception):
+    """The database could not be reached; the operation that raised it did not take effect"""
 
 class DatabaseManager:
     """Handles all database operations and connections"""
     
     def __init__(self):
-        self.connection = None
+        self.pool = None
+        self._pool_slots = None
+        self._last_used = {}
+        self._local = threading.local()
+        # Registered statements by name, and the names already prepared on each connection
+        self._statements = {}
+        self._prepared = {}
+        # Latency, row and error statistics per statement kind
+        self.metrics = QueryMetrics()
+        self._statement_kinds = {}
+        # When the database became unreachable (None while it is up) and when to try it again
+        self._outage_lock = threading.Lock()
+        self._outage_started = None
+        self._outage_attempts = 0
+        self._next_attempt = 0.0
         self._load_config()
+        self.prepare('random_tweet_id', RANDOM_TWEET_ID_SQL, idempotent=True)
     
     def _load_config(self):
         """Load database configuration from environment variables"""
@@ -27,43 +73,451 @@ class DatabaseManager:
             'user': os.getenv('DB_USER'),
             'password': os.getenv('DB_PASSWORD')
         }
+        
+        # Connection pool sizing; the defaults keep the original single-connection behaviour
+        self.pool_min_size = int(os.getenv('DB_POOL_MIN_SIZE', '1'))
+        self.pool_max_size = int(os.getenv('DB_POOL_MAX_SIZE', '1'))
+        self.pool_max_idle = float(os.getenv('DB_POOL_MAX_IDLE_SECONDS', '300'))
+        self.pool_health_check_after = float(os.getenv('DB_POOL_HEALTH_CHECK_AFTER_SECONDS', '5'))
+        self.pool_checkout_timeout = float(os.getenv('DB_POOL_CHECKOUT_TIMEOUT_SECONDS', '30'))
+        
+        # Run registered statements as server-side prepared statements; false sends plain SQL
+        self.prepare_statements = os.getenv('DB_PREPARE_STATEMENTS', 'true').lower() == 'true'
+        
+        # Lost connections are retried with jittered exponential backoff; once DB_RETRY_ATTEMPTS
+        # retries fail the database counts as down and is probed at most every DB_RETRY_MAX_DELAY_SECONDS
+        self.retry_attempts = int(os.getenv('DB_RETRY_ATTEMPTS', '5'))
+        self.retry_base_delay = float(os.getenv('DB_RETRY_BASE_DELAY_SECONDS', '0.2'))
+        self.retry_max_delay = float(os.getenv('DB_RETRY_MAX_DELAY_SECONDS', '30'))
+        
+        # Seconds between query latency summaries in the log; 0 turns the summary off
+        self.metrics_log_interval = float(os.getenv('QUERY_METRICS_LOG_SECONDS', '60'))
+        
+        if self.pool_min_size < 0 or self.pool_max_size < max(1, self.pool_min_size):
+            raise ValueError(
+                f"Invalid pool size: min={self.pool_min_size}, max={self.pool_max_size}"
+            )
     
     def connect(self):
-        """Establish connection to PostgreSQL database"""
+        """Create the PostgreSQL connection pool, waiting for the server if it isn't up yet"""
         try:
-            self.connection = psycopg2.connect(**self.config)
-            self.connection.autocommit = True
-            logging.info("Successfully connected to PostgreSQL database")
+            for attempt in range(self.retry_attempts + 1):
+                try:
+                    self.pool = ThreadedConnectionPool(
+                        self.pool_min_size,
+                        self.pool_max_size,
+                        **self.config
+                    )
+                    break
+                except psycopg2.OperationalError as e:
+                    if attempt == self.retry_attempts:
+                        raise DatabaseUnavailableError(f"Could not connect to the database: {e}") from e
+                    delay = self._backoff_delay(attempt)
+                    logging.warning(f"Database not reachable, retrying in {delay:.1f}s: {e}")
+                    time.sleep(delay)
+            
+            # psycopg2 closes returned connections once minconn are idle. DB_POOL_MIN_SIZE only sets
+            # how many are opened up front; keep up to the maximum open so concurrent writers
+            # don't reconnect (and re-PREPARE) on every checkout. Idle ones are still recycled
+            # after DB_POOL_MAX_IDLE_SECONDS.
+            self.pool.minconn = self.pool_max_size
+            
+            # ThreadedConnectionPool raises instead of blocking when exhausted,
+            # so callers queue on this semaphore until a connection is free
+            self._pool_slots = threading.BoundedSemaphore(self.pool_max_size)
+            self._last_used = {}
+            self._prepared = {}
+            self._outage_started = None
+            if self.metrics_log_interval > 0:
+                self.metrics.start_reporter(self.metrics_log_interval)
+            logging.info(
+                f"Successfully connected to PostgreSQL database "
+                f"(pool size {self.pool_min_size}-{self.pool_max_size})"
+            )
             return True
         except Exception as e:
             logging.error(f"Error connecting to database: {e}")
             raise
     
     def disconnect(self):
-        """Close database connection"""
-        if self.connection:
-            self.connection.close()
-            logging.info("Database connection closed")
+        """Close all pooled database connections"""
+        if self.pool:
+            self.pool.closeall()
+            self.pool = None
+            logging.info("Database connection pool closed")
+    
+    def _is_healthy(self, conn):
+        """Check that a pooled connection is still usable"""
+        if conn.closed:
+            return False
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            return True
+        except psycopg2.Error:
+            return False
+    
+    def _checkout(self):
+        """Take a connection from the pool, replacing idle or broken ones"""
+        # One retry per pool slot is enough to cycle out every stale connection
+        for _ in range(self.pool_max_size + 1):
+            conn = self.pool.getconn()
+            idle_for = time.monotonic() - self._last_used.get(id(conn), time.monotonic())
+            
+            # Fresh pool connections start in manual-commit mode; switch before any ping
+            # so the health check can't leave an open transaction behind
+            if not conn.closed and not conn.autocommit:
+                conn.autocommit = True
+            
+            # Only ping connections that sat idle long enough to have gone stale
+            needs_ping = idle_for > self.pool_health_check_after
+            
+            if idle_for > self.pool_max_idle:
+                logging.debug(f"Recycling connection idle for {idle_for:.0f}s")
+            elif not conn.closed and (not needs_ping or self._is_healthy(conn)):
+                return conn
+            else:
+                logging.warning("Discarding broken pooled connection")
+            
+            self._forget(conn)
+            self.pool.putconn(conn, close=True)
+        
+        raise psycopg2.OperationalError("Could not obtain a healthy connection from the pool")
+    
+    def _checkin(self, conn):
+        """Return a connection to the pool"""
+        if conn.closed:
+            # A dropped connection usually means the server went away; make the idle ones
+            # pass a health check before they are handed out again
+            self._expect_stale_connections()
+            self.pool.putconn(conn, close=True)
+        else:
+            self._last_used[id(conn)] = time.monotonic()
+            self.pool.putconn(conn)
+        
+        # The pool closes connections returned with close=True; drop their idle timestamp
+        # so a new connection that reuses the same id() isn't mistaken for a stale one
+        if conn.closed:
+            self._forget(conn)
+    
+    def _forget(self, conn):
+        """Drop the bookkeeping kept for a closed connection"""
+        self._last_used.pop(id(conn), None)
+        self._prepared.pop(id(conn), None)
+    
+    def _expect_stale_connections(self):
+        """Make the next checkout of every idle pooled connection ping it first"""
+        stale = time.monotonic() - self.pool_health_check_after - 1
+        for key, last_used in list(self._last_used.items()):
+            self._last_used[key] = min(last_used, stale)
+    
+    def _backoff_delay(self, attempt):
+        """Full-jitter exponential backoff: uniform up to base * 2**attempt, capped"""
+        return random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * 2 ** min(attempt, 30)))
+    
+    @property
+    def available(self):
+        """False while the database counts as down after failed reconnects"""
+        return self._outage_started is None
+    
+    def _schedule_reconnect(self):
+        """Push the next reconnect attempt one backoff step out; call with the outage lock held"""
+        self._next_attempt = time.monotonic() + self._backoff_delay(self._outage_attempts)
+        self._outage_attempts += 1
+    
+    def _checkout_with_retry(self):
+        """Check out a connection, reconnecting with backoff if the server can't be reached
+        
+        Once retry_attempts retries have failed the database counts as down: callers get
+        DatabaseUnavailableError straight away and one of them at a time tries to reconnect,
+        with the backoff growing up to retry_max_delay between attempts.
+        """
+        with self._outage_lock:
+            probing = self._outage_started is not None
+            if probing:
+                now = time.monotonic()
+                if now < self._next_attempt:
+                    raise DatabaseUnavailableError(
+                        f"Database unreachable for {now - self._outage_started:.0f}s, "
+                        f"next reconnect attempt in {self._next_attempt - now:.1f}s"
+                    )
+                self._schedule_reconnect()
+        
+        attempts = 1 if probing else self.retry_attempts + 1
+        for attempt in range(attempts):
+            try:
+                conn = self._checkout()
+            except psycopg2.OperationalError as e:
+                error = e
+                if attempt + 1 < attempts:
+                    delay = self._backoff_delay(attempt)
+                    logging.warning(f"Database connection failed, retrying in {delay:.2f}s: {e}")
+                    time.sleep(delay)
+                continue
+            
+            with self._outage_lock:
+                if self._outage_started is not None:
+                    logging.info(
+                        f"Database connection restored after {time.monotonic() - self._outage_started:.1f}s"
+                    )
+                    self._outage_started = None
+            return conn
+        
+        with self._outage_lock:
+            if self._outage_started is None:
+                self._outage_started = time.monotonic()
+                self._outage_attempts = self.retry_attempts
+                self._schedule_reconnect()
+                logging.error(f"Database unreachable after {self.retry_attempts} retries, backing off: {error}")
+        raise DatabaseUnavailableError(f"Could not connect to the database: {error}") from error
     
-    def execute_query(self, query, params=None, fetch=False):
-        """Execute a database query"""
+    @contextmanager
+    def get_connection(self):
+        """Check out a healthy connection for the duration of the block"""
+        # Statements issued inside transaction() reuse that transaction's connection
+        tx_conn = getattr(self._local, 'connection', None)
+        if tx_conn is not None:
+            yield tx_conn
+            return
+        
+        if self.pool is None:
+            raise RuntimeError("Database is not connected; call connect() first")
+        
+        started = time.perf_counter()
+        if not self._pool_slots.acquire(timeout=self.pool_checkout_timeout):
+            self.metrics.record('pool_wait', time.perf_counter() - started, error=True)
+            raise PoolError(
+                f"Timed out after {self.pool_checkout_timeout}s waiting for a database connection"
+            )
+        
+        conn = None
         try:
-            cursor = self.connection.cursor(cursor_factory=RealDictCursor if fetch else None)
+            conn = self._checkout_with_retry()
+            self.metrics.record('pool_wait', time.perf_counter() - started)
+            yield conn
+        finally:
+            if conn is not None:
+                self._checkin(conn)
+            self._pool_slots.release()
+    
+    @contextmanager
+    def transaction(self):
+        """Run every query issued by this thread inside the block as one transaction"""
+        if getattr(self._local, 'connection', None) is not None:
+            # Nested blocks join the enclosing transaction
+            yield
+            return
+        
+        with self.get_connection() as conn:
+            conn.autocommit = False
+            self._local.connection = conn
+            committing = False
+            try:
+                yield
+                committing = True
+                started = time.perf_counter()
+                conn.commit()
+                self.metrics.record('commit', time.perf_counter() - started)
+            except Exception as e:
+                if not conn.closed:
+                    conn.rollback()
+                elif not committing and isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError)):
+                    # The server rolls back what it had of the transaction, so it is safe to replay;
+                    # a connection lost during COMMIT leaves the outcome unknown and is re-raised as is
+                    raise DatabaseUnavailableError(f"Connection lost during transaction: {e}") from e
+                raise
+            finally:
+                self._local.connection = None
+                if not conn.closed:
+                    conn.autocommit = True
+    
+    def _statement_kind(self, query):
+        """Name an ad-hoc statement for the query metrics, e.g. insert_tweets or select_users"""
+        kind = self._statement_kinds.get(query)
+        if kind is None:
+            match = _STATEMENT_TARGET.search(query)
+            if match is None:
+                kind = query.split(None, 1)[0].lower() if query.strip() else 'empty'
+            else:
+                verb = match.group(1).split()[0].lower()
+                kind = f"{'select' if verb == 'from' else verb}_{match.group(2).lower()}"
+            self._statement_kinds[query] = kind
+        return kind
+    
+    def _run(self, kind, operation, idempotent=False):
+        """Call operation(conn) with a pooled connection and record it under kind in the metrics
+        
+        operation returns (result, row count). If the connection drops outside a transaction,
+        idempotent operations are retried on a new one; anything else is re-raised, since it
+        may have committed before the drop.
+        """
+        for attempt in range(self.retry_attempts + 1):
+            conn = None
+            try:
+                with self.get_connection() as conn:
+                    started = time.perf_counter()
+                    try:
+                        result, rows = operation(conn)
+                    except Exception:
+                        self.metrics.record(kind, time.perf_counter() - started, error=True)
+                        raise
+                    self.metrics.record(kind, time.perf_counter() - started, rows)
+                    return result
+            except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                in_transaction = getattr(self._local, 'connection', None) is not None
+                lost = conn is not None and conn.closed
+                if not (idempotent and lost) or in_transaction or attempt == self.retry_attempts:
+                    raise
+                delay = self._backoff_delay(attempt)
+                logging.warning(f"Connection lost, retrying in {delay:.2f}s: {e}")
+                time.sleep(delay)
+    
+    def execute_query(self, query, params=None, fetch=False, idempotent=False, kind=None):
+        """Execute a database query; idempotent queries are retried if the connection drops
+        
+        kind names the statement in the query metrics and defaults to verb_table from the SQL.
+        """
+        def run(conn):
+            cursor = conn.cursor(cursor_factory=RealDictCursor if fetch else None)
             cursor.execute(query, params)
             
             if fetch:
                 result = cursor.fetchall()
-                cursor.close()
-                return result
             else:
                 result = cursor.fetchone() if cursor.description else None
-                cursor.close()
-                return result
-                
+            rows = cursor.rowcount
+            cursor.close()
+            return result, rows
+        
+        try:
+            return self._run(kind or self._statement_kind(query), run, idempotent)
+        except DatabaseUnavailableError:
+            raise
         except Exception as e:
             logging.error(f"Error executing query: {e}")
             raise
     
+    def prepare(self, name, query, types=None, idempotent=False):
+        """Register a statement to run as a server-side prepared statement under name
+        
+        The statement is prepared on each pooled connection the first time it runs there.
+        types lists Postgres parameter types for parameters whose type can't be inferred;
+        idempotent statements are retried if the connection drops, like in execute_query.
+        """
+        names = []
+        count = 0
+        
+        def to_server(match):
+            nonlocal count
+            if match.group(0) == '%%':
+                return '%'
+            if match.group(1):
+                if match.group(1) not in names:
+                    names.append(match.group(1))
+                return f"${names.index(match.group(1)) + 1}"
+            count += 1
+            return f"${count}"
+        
+        server_query = _PLACEHOLDER.sub(to_server, query)
+        args = [f"%({arg})s" for arg in names] if names else ['%s'] * count
+        type_list = f"({', '.join(types)}) " if types else ''
+        self._statements[name] = {
+            'query': query,
+            'prepare': f"PREPARE {name} {type_list}AS {server_query}",
+            'execute': f"EXECUTE {name} ({', '.join(args)})" if args else f"EXECUTE {name}",
+            'idempotent': idempotent,
+        }
+    
+    def execute_prepared(self, name, params=None, fetch=False):
+        """Execute a statement registered with prepare(); same results as execute_query"""
+        statement = self._statements[name]
+        if not self.prepare_statements:
+            # Report under the statement name either way, so metrics compare across the setting
+            return self.execute_query(statement['query'], params, fetch, statement['idempotent'], kind=name)
+        
+        def run(conn):
+            # A reconnect brings a new connection, which prepares its statements afresh
+            prepared = self._prepared.setdefault(id(conn), set())
+            cursor = conn.cursor(cursor_factory=RealDictCursor if fetch else None)
+            if name not in prepared:
+                # Prepared statements outlive transactions, so a rollback doesn't undo this
+                cursor.execute(statement['prepare'])
+                prepared.add(name)
+            cursor.execute(statement['execute'], params)
+            
+            if fetch:
+                result = cursor.fetchall()
+            else:
+                result = cursor.fetchone() if cursor.description else None
+            rows = cursor.rowcount
+            cursor.close()
+            return result, rows
+        
+        try:
+            return self._run(name, run, statement['idempotent'])
+        except DatabaseUnavailableError:
+            raise
+        except Exception as e:
+            logging.error(f"Error executing prepared statement {name}: {e}")
+            raise
+    
+    def execute_values(self, query, rows, template=None, page_size=1000, fetch=False, kind=None):
+        """Execute a multi-row statement; query must contain a single VALUES %s placeholder"""
+        def run(conn):
+            cursor = conn.cursor()
+            result = execute_values(
+                cursor, query, rows,
+                template=template, page_size=page_size, fetch=fetch
+            )
+            # rowcount only covers the last page
+            count = len(result) if fetch else cursor.rowcount
+            cursor.close()
+            return (result if fetch else None), count
+        
+        try:
+            return self._run(kind or self._statement_kind(query), run)
+        except DatabaseUnavailableError:
+            raise
+        except Exception as e:
+            logging.error(f"Error executing batch query: {e}")
+            raise
+    
+    def reserve_ids(self, table, column, count):
+        """Reserve count values from the serial sequence behind table.column"""
+        result = self.execute_query(
+            "SELECT nextval(pg_get_serial_sequence(%s, %s)) AS id FROM generate_series(1, %s)",
+            (table, column, count),
+            fetch=True
+        )
+        return [row['id'] for row in result]
+    
+    def copy_rows(self, table, columns, rows):
+        """Bulk load rows into a table with COPY FROM STDIN"""
+        try:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for row in rows:
+                writer.writerow([_to_copy_value(value) for value in row])
+            buffer.seek(0)
+            
+            with self.get_connection() as conn:
+                started = time.perf_counter()
+                cursor = conn.cursor()
+                cursor.copy_expert(
+                    f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+                    buffer
+                )
+                copied = cursor.rowcount
+                cursor.close()
+                self.metrics.record(f"copy_{table}", time.perf_counter() - started, copied)
+                return copied
+        
+        except DatabaseUnavailableError:
+            raise
+        except Exception as e:
+            logging.error(f"Error copying rows into {table}: {e}")
+            raise
+    
     def init_database(self):
         """Initialize database tables if they don't exist"""
         try:
@@ -75,9 +529,12 @@ class DatabaseManager:
                     email VARCHAR(100) UNIQUE NOT NULL,
                     full_name VARCHAR(100),
                     bio TEXT,
+                    profile_image_url VARCHAR(255),
                     followers_count INTEGER DEFAULT 0,
                     following_count INTEGER DEFAULT 0,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    verified BOOLEAN DEFAULT FALSE,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
             """)
             
@@ -86,18 +543,41 @@ class DatabaseManager:
                 CREATE TABLE IF NOT EXISTS tweets (
                     tweet_id SERIAL PRIMARY KEY,
                     user_id INTEGER NOT NULL,
-                    content TEXT NOT NULL,
+                    content TEXT NOT NULL CHECK (LENGTH(content) <= 280),
                     hashtags TEXT[],
                     mentions TEXT[],
                     likes_count INTEGER DEFAULT 0,
                     retweets_count INTEGER DEFAULT 0,
+                    replies_count INTEGER DEFAULT 0,
                     reply_to_tweet_id INTEGER,
+                    is_retweet BOOLEAN DEFAULT FALSE,
+                    original_tweet_id INTEGER,
+                    location VARCHAR(100),
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
-                    FOREIGN KEY (reply_to_tweet_id) REFERENCES tweets(tweet_id) ON DELETE SET NULL
+                    FOREIGN KEY (reply_to_tweet_id) REFERENCES tweets(tweet_id) ON DELETE SET NULL,
+                    FOREIGN KEY (original_tweet_id) REFERENCES tweets(tweet_id) ON DELETE SET NULL
                 )
             """)
             
+            # Tables created by older versions of this method lack the engagement columns
+            self.execute_query("""
+                ALTER TABLE users
+                    ADD COLUMN IF NOT EXISTS profile_image_url VARCHAR(255),
+                    ADD COLUMN IF NOT EXISTS verified BOOLEAN DEFAULT FALSE,
+                    ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            """)
+            self.execute_query("""
+                ALTER TABLE tweets
+                    ADD COLUMN IF NOT EXISTS replies_count INTEGER DEFAULT 0,
+                    ADD COLUMN IF NOT EXISTS is_retweet BOOLEAN DEFAULT FALSE,
+                    ADD COLUMN IF NOT EXISTS original_tweet_id INTEGER
+                        REFERENCES tweets(tweet_id) ON DELETE SET NULL,
+                    ADD COLUMN IF NOT EXISTS location VARCHAR(100),
+                    ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            """)
+            
             # Create follows table
             self.execute_query("""
                 CREATE TABLE IF NOT EXISTS follows (
@@ -112,46 +592,168 @@ class DatabaseManager:
                 )
             """)
             
-            logging.info("Database tables initialized successfully")
+            # Deleting a tweet nulls out replies and retweets pointing at it; without these
+            # indexes every delete scans the whole tweets table
+            self.execute_query("CREATE INDEX IF NOT EXISTS idx_tweets_reply_to ON tweets(reply_to_tweet_id)")
+            self.execute_query("CREATE INDEX IF NOT EXISTS idx_tweets_original ON tweets(original_tweet_id)")
             
+            # Create likes table
+            self.execute_query("""
+                CREATE TABLE IF NOT EXISTS likes (
+                    like_id SERIAL PRIMARY KEY,
+                    user_id INTEGER NOT NULL,
+                    tweet_id INTEGER NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
+                    FOREIGN KEY (tweet_id) REFERENCES tweets(tweet_id) ON DELETE CASCADE,
+                    UNIQUE(user_id, tweet_id)
+                )
+            """)
+            
+            # Remaining indexes from db/init.sql, so a database created here matches the docker one
+            for index, table, column in (
+                ('idx_tweets_user_id', 'tweets', 'user_id'),
+                ('idx_tweets_created_at', 'tweets', 'created_at'),
+                ('idx_follows_follower', 'follows', 'follower_id'),
+                ('idx_follows_following', 'follows', 'following_id'),
+                ('idx_likes_user_id', 'likes', 'user_id'),
+                ('idx_likes_tweet_id', 'likes', 'tweet_id'),
+                ('idx_users_username', 'users', 'username'),
+                ('idx_users_email', 'users', 'email'),
+            ):
+                self.execute_query(f"CREATE INDEX IF NOT EXISTS {index} ON {table}({column})")
+            
+            logging.info("Database tables initialized successfully")
+        
         except Exception as e:
             logging.error(f"Error initializing database: {e}")
             raise
     
-    def get_user_ids(self, limit=100):
-        """Get existing user IDs from database"""
+    def get_user_ids(self, partition_index=0, partition_count=1, chunk_size=100000):
+        """Get all existing user IDs (optionally one user_id % partition_count slice) as array('i')"""
+        user_ids = array('i')
+        try:
+            with self.get_connection() as conn:
+                # A server-side cursor keeps client memory at one chunk plus the packed array
+                cursor = conn.cursor(name='user_ids', withhold=True)
+                try:
+                    cursor.execute(
+                        "SELECT user_id FROM users WHERE user_id %% %s = %s ORDER BY user_id",
+                        (partition_count, partition_index)
+                    )
+                    chunks = 0
+                    while True:
+                        rows = cursor.fetchmany(chunk_size)
+                        if not rows:
+                            break
+                        user_ids.extend(row[0] for row in rows)
+                        chunks += 1
+                        if chunks % 10 == 0:
+                            logging.info(f"Loaded {len(user_ids)} user IDs so far...")
+                finally:
+                    cursor.close()
+            return user_ids
+        except Exception as e:
+            logging.error(f"Error getting user IDs: {e}")
+            return array('i')
+    
+    def count_users_by_partition(self, partition_count):
+        """Number of users in each user_id % partition_count slice, as a list indexed by slice"""
+        counts = [0] * partition_count
         try:
             result = self.execute_query(
-                "SELECT user_id FROM users LIMIT %s", 
-                (limit,), 
-                fetch=True
+                "SELECT user_id %% %s AS slice, count(*) AS users FROM users GROUP BY 1",
+                (partition_count,), fetch=True, idempotent=True
             )
-            return [user['user_id'] for user in result] if result else []
+            for row in result:
+                counts[row['slice']] = row['users']
+            return counts
         except Exception as e:
-            logging.error(f"Error getting user IDs: {e}")
-            return []
+            logging.error(f"Error counting users per partition: {e}")
+            raise
     
     def get_random_tweet_id(self):
         """Get a random tweet ID for replies"""
         try:
-            result = self.execute_query(
-                "SELECT tweet_id FROM tweets ORDER BY RANDOM() LIMIT 1",
-                fetch=True
-            )
+            result = self.execute_prepared('random_tweet_id', fetch=True)
             return result[0]['tweet_id'] if result else None
         except Exception as e:
             logging.error(f"Error getting random tweet ID: {e}")
             return None
     
-    def check_follow_exists(self, follower_id, following_id):
-        """Check if follow relationship already exists"""
+    def get_id_range(self, table, column):
+        """Return (min, max) of an indexed ID column, or None if the table is empty"""
         try:
             result = self.execute_query(
-                "SELECT 1 FROM follows WHERE follower_id = %s AND following_id = %s",
-                (follower_id, following_id),
-                fetch=True
+                f"SELECT min({column}) AS low, max({column}) AS high FROM {table}",
+                fetch=True, idempotent=True
             )
-            return len(result) > 0 if result else False
+            if not result or result[0]['low'] is None:
+                return None
+            return result[0]['low'], result[0]['high']
         except Exception as e:
-            logging.error(f"Error checking follow relationship: {e}")
-            return True  # Assume exists to prevent duplicates on error
\ No newline at end of file
+            logging.error(f"Error getting ID range of {table}.{column}: {e}")
+            return None
+    
+    def get_recent_tweet_ids(self, limit=10000, partition_index=0, partition_count=1):
+        """Get the most recently inserted tweet IDs, oldest first, optionally only those written
+        by one user_id % partition_count slice"""
+        try:
+            if partition_count > 1:
+                result = self.execute_query(
+                    "SELECT tweet_id FROM tweets WHERE user_id %% %s = %s ORDER BY tweet_id DESC LIMIT %s",
+                    (partition_count, partition_index, limit),
+                    fetch=True,
+                    idempotent=True
+                )
+            else:
+                result = self.execute_query(
+                    "SELECT tweet_id FROM tweets ORDER BY tweet_id DESC LIMIT %s",
+                    (limit,),
+                    fetch=True,
+                    idempotent=True
+                )
+            return [tweet['tweet_id'] for tweet in reversed(result)] if result else []
+        except Exception as e:
+            logging.error(f"Error getting recent tweet IDs: {e}")
+            return []
+    
+    def iter_follow_pairs(self, partition_index=0, partition_count=1, chunk_size=50000):
+        """Stream (follower_id, following_id) pairs, optionally of one follower_id % partition_count
+        slice, using a server-side cursor"""
+        with self.get_connection() as conn:
+            # WITH HOLD lets the named cursor live outside a transaction in autocommit mode
+            cursor = conn.cursor(name='follow_pairs', withhold=True)
+            cursor.itersize = chunk_size
+            try:
+                if partition_count > 1:
+                    cursor.execute(
+                        "SELECT follower_id, following_id FROM follows WHERE follower_id %% %s = %s",
+                        (partition_count, partition_index)
+                    )
+                else:
+                    cursor.execute("SELECT follower_id, following_id FROM follows")
+                for row in cursor:
+                    yield row
+            finally:
+                cursor.close()
+    
+    def trigger_exists(self, table, trigger_name):
+        """Check whether a trigger is installed on a table"""
+        try:
+            result = self.execute_query("""
+                SELECT 1 FROM pg_trigger
+                WHERE tgrelid = to_regclass(%s) AND tgname = %s AND NOT tgisinternal
+            """, (table, trigger_name), fetch=True, idempotent=True)
+            return bool(result)
+        except Exception as e:
+            logging.error(f"Error checking trigger {trigger_name}: {e}")
+            return False
+
+
+def _to_copy_value(value):
+    """Convert a Python value to its COPY csv text form (None becomes NULL)"""
+    if isinstance(value, (list, tuple)):
+        escaped = (str(item).replace('\\', '\\\\').replace('"', '\\"') for item in value)
+        return '{' + ','.join(f'"{item}"' for item in escaped) + '}'
+    return value
@@ -0,0 +1,48 @@
+import threading
+from collections import deque
+
+
+class EventBuffer:
+    """Bounded FIFO of generated event batches waiting for the database to come back"""
+    
+    def __init__(self, max_events=100000):
+        if max_events < 0:
+            raise ValueError(f"Buffer size must not be negative, got {max_events}")
+        self.max_events = max_events
+        self.dropped = 0
+        self._batches = deque()
+        self._events = 0
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return self._events
+    
+    def _trim(self):
+        """Drop the oldest batches until the buffer is within max_events again"""
+        while self._events > self.max_events:
+            _, rows = self._batches.popleft()
+            self._events -= len(rows)
+            self.dropped += len(rows)
+    
+    def add(self, kind, rows):
+        """Queue a batch of rows of one event kind, dropping the oldest events once full"""
+        with self._lock:
+            self._batches.append((kind, rows))
+            self._events += len(rows)
+            self._trim()
+    
+    def requeue(self, kind, rows):
+        """Put a batch taken with pop() back at the front, e.g. when replaying it failed"""
+        with self._lock:
+            self._batches.appendleft((kind, rows))
+            self._events += len(rows)
+            self._trim()
+    
+    def pop(self):
+        """Take the oldest (kind, rows) batch, or None if the buffer is empty"""
+        with self._lock:
+            if not self._batches:
+                return None
+            kind, rows = self._batches.popleft()
+            self._events -= len(rows)
+            return kind, rows
@@ -0,0 +1,84 @@
+import threading
+from array import array
+import numpy as np
+
+
+class FollowGraph:
+    """In-process index of existing follow edges, packed as 64-bit integer keys: loaded edges live
+    in a sorted int64 array (8 bytes each), runtime changes in small delta sets folded in over time"""
+    
+    def __init__(self, compact_ratio=0.1, min_compact=100000):
+        self.compact_ratio = compact_ratio
+        self.min_compact = min_compact
+        self._base = np.empty(0, dtype=np.int64)
+        # Edges not in _base, and edges of _base that were removed
+        self._added = set()
+        self._removed = set()
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self._base) - len(self._removed) + len(self._added)
+    
+    @staticmethod
+    def _key(follower_id, following_id):
+        """Pack a (follower, following) pair of 32-bit IDs into one int64 key"""
+        return (follower_id << 32) | following_id
+    
+    def _in_base(self, key):
+        base = self._base
+        index = int(np.searchsorted(base, key))
+        return index < len(base) and int(base[index]) == key
+    
+    def contains(self, follower_id, following_id):
+        """Check whether the edge is already known"""
+        key = self._key(follower_id, following_id)
+        if key in self._added:
+            return True
+        return key not in self._removed and self._in_base(key)
+    
+    def add(self, follower_id, following_id):
+        """Record an edge"""
+        key = self._key(follower_id, following_id)
+        with self._lock:
+            if key in self._removed:
+                self._removed.discard(key)
+            elif not self._in_base(key):
+                self._added.add(key)
+            self._maybe_compact()
+    
+    def discard(self, follower_id, following_id):
+        """Forget an edge if present"""
+        key = self._key(follower_id, following_id)
+        with self._lock:
+            if key in self._added:
+                self._added.discard(key)
+            elif self._in_base(key):
+                self._removed.add(key)
+            self._maybe_compact()
+    
+    def _maybe_compact(self):
+        if len(self._added) + len(self._removed) > max(self.min_compact, len(self._base) * self.compact_ratio):
+            self._compact()
+    
+    def _compact(self):
+        """Fold the delta sets into the sorted array"""
+        base = self._base
+        if self._removed:
+            removed = np.fromiter(self._removed, dtype=np.int64, count=len(self._removed))
+            base = np.delete(base, np.searchsorted(base, removed))
+        if self._added:
+            added = np.sort(np.fromiter(self._added, dtype=np.int64, count=len(self._added)))
+            base = np.insert(base, np.searchsorted(base, added), added)
+        self._base = base
+        self._added = set()
+        self._removed = set()
+    
+    def load(self, pairs):
+        """Bulk-load edges from an iterable of (follower_id, following_id) pairs"""
+        key = self._key
+        # Packed int64 keys while streaming, so loading never holds the edges as Python ints
+        keys = array('q', (key(follower_id, following_id) for follower_id, following_id in pairs))
+        loaded = np.unique(np.frombuffer(keys, dtype=np.int64))
+        with self._lock:
+            self._compact()
+            self._base = np.union1d(self._base, loaded)
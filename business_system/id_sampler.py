@@ -0,0 +1,59 @@
+import random
+import threading
+
+
+class RecentIdBuffer:
+    """Bounded ring buffer of recently inserted IDs with constant-time random sampling"""
+    
+    def __init__(self, capacity=10000):
+        if capacity < 1:
+            raise ValueError(f"Buffer capacity must be positive, got {capacity}")
+        self.capacity = capacity
+        self._ids = []
+        self._next = 0
+        # Writer threads share one buffer, and discard() swaps the list out from under add()
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self._ids)
+    
+    def add(self, id_value):
+        """Record an ID, overwriting the oldest one once the buffer is full"""
+        with self._lock:
+            self._add(id_value)
+    
+    def _add(self, id_value):
+        if len(self._ids) < self.capacity:
+            self._ids.append(id_value)
+        else:
+            self._ids[self._next] = id_value
+            self._next = (self._next + 1) % self.capacity
+    
+    def extend(self, id_values):
+        """Record several IDs in insertion order"""
+        with self._lock:
+            for id_value in id_values:
+                self._add(id_value)
+    
+    def discard(self, id_values):
+        """Forget IDs whose rows are gone, e.g. deleted tweets"""
+        dropped = set(id_values)
+        with self._lock:
+            # Rebuild oldest-first so the next overwrite still hits the oldest entry once full
+            ordered = self._ids[self._next:] + self._ids[:self._next]
+            self._ids = [id_value for id_value in ordered if id_value not in dropped]
+            self._next = 0
+    
+    def sample(self):
+        """Return a random buffered ID, or None if the buffer is empty"""
+        with self._lock:
+            if not self._ids:
+                return None
+            return self._ids[random.randrange(len(self._ids))]
+    
+    def sample_many(self, count):
+        """Return count random buffered IDs (with replacement), or [] if the buffer is empty"""
+        with self._lock:
+            if not self._ids or count <= 0:
+                return []
+            return random.choices(self._ids, k=count)
@@ -0,0 +1,158 @@
+import math
+import time
+import logging
+import threading
+
+# Log-linear buckets in microseconds: values below 2 * SUB_BUCKETS are exact, above that each
+# power of two is split into SUB_BUCKETS buckets, so any recorded value is off by at most ~3%
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+MAX_MAGNITUDE = 36  # about 25 days in microseconds; larger values land in the last bucket
+BUCKET_COUNT = (MAX_MAGNITUDE + 2) * SUB_BUCKETS
+
+
+def _bucket_index(micros):
+    """Map a latency in whole microseconds to its histogram bucket"""
+    magnitude = max(0, micros.bit_length() - SUB_BUCKET_BITS - 1)
+    return min(BUCKET_COUNT - 1, magnitude * SUB_BUCKETS + (micros >> magnitude))
+
+
+def _bucket_value(index):
+    """Upper bound in microseconds of the values that fall into a bucket"""
+    if index < 2 * SUB_BUCKETS:
+        return index
+    magnitude = index // SUB_BUCKETS - 1
+    return ((index - magnitude * SUB_BUCKETS + 1) << magnitude) - 1
+
+
+class LatencyHistogram:
+    """HDR-style fixed-size latency histogram with ~3% precision and O(1) recording"""
+    
+    def __init__(self):
+        self.counts = [0] * BUCKET_COUNT
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+    
+    def record(self, seconds):
+        """Add one latency sample"""
+        self.counts[_bucket_index(int(seconds * 1000000))] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+    
+    def percentiles(self, quantiles):
+        """Return the latency in seconds at each quantile (0-1), in one pass over the buckets"""
+        results = []
+        if not self.count:
+            return [0.0] * len(quantiles)
+        
+        targets = iter(sorted((max(1, math.ceil(q * self.count)), i) for i, q in enumerate(quantiles)))
+        target = next(targets, None)
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            while target is not None and seen >= target[0]:
+                results.append((target[1], min(_bucket_value(index) / 1000000, self.max)))
+                target = next(targets, None)
+            if target is None:
+                break
+        return [value for _, value in sorted(results)]
+
+
+class StatementStats:
+    """Latency histogram, row and error counters of one statement kind"""
+    
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.rows = 0
+        self.errors = 0
+    
+    def snapshot(self):
+        p50, p99, p999 = self.latency.percentiles((0.5, 0.99, 0.999))
+        count = self.latency.count
+        return {
+            'count': count,
+            'errors': self.errors,
+            'rows': self.rows,
+            'total_seconds': self.latency.total,
+            'mean_ms': self.latency.total / count * 1000 if count else 0.0,
+            'p50_ms': p50 * 1000,
+            'p99_ms': p99 * 1000,
+            'p999_ms': p999 * 1000,
+            'max_ms': self.latency.max * 1000,
+        }
+
+
+class QueryMetrics:
+    """Per-statement-kind latency, row and error statistics collected by DatabaseManager"""
+    
+    def __init__(self):
+        # Totals since startup, and the window since the last periodic summary
+        self._totals = {}
+        self._window = {}
+        self._window_started = time.monotonic()
+        self._lock = threading.Lock()
+        self._reporter = None
+    
+    def _stats(self, table, kind):
+        stats = table.get(kind)
+        if stats is None:
+            stats = table[kind] = StatementStats()
+        return stats
+    
+    def record(self, kind, seconds, rows=0, error=False):
+        """Record one execution of a statement kind"""
+        with self._lock:
+            for table in (self._totals, self._window):
+                stats = self._stats(table, kind)
+                stats.latency.record(seconds)
+                if error:
+                    stats.errors += 1
+                elif rows > 0:
+                    stats.rows += rows
+    
+    def snapshot(self, window=False):
+        """Statistics per statement kind, since startup or since the last summary with window=True"""
+        with self._lock:
+            table = self._window if window else self._totals
+            return {kind: stats.snapshot() for kind, stats in table.items()}
+    
+    def log_summary(self):
+        """Log p50/p99/p999 latency per statement kind for the window since the last summary"""
+        with self._lock:
+            window, self._window = self._window, {}
+            now = time.monotonic()
+            elapsed, self._window_started = now - self._window_started, now
+        
+        if not window:
+            return
+        
+        snapshots = {kind: stats.snapshot() for kind, stats in window.items()}
+        # Waiting for a pooled connection is time spent in the client, not in Postgres
+        busy = sum(snapshot['total_seconds'] for kind, snapshot in snapshots.items() if kind != 'pool_wait')
+        logging.info(
+            f"Query latency over the last {elapsed:.0f}s: {busy:.1f}s spent in the database "
+            f"across {len(snapshots)} statement kinds"
+        )
+        # Kinds that took the most database time first
+        for kind, snapshot in sorted(snapshots.items(), key=lambda item: -item[1]['total_seconds']):
+            logging.info(
+                f"  {kind}: {snapshot['count']} calls, {snapshot['rows']} rows, {snapshot['errors']} errors, "
+                f"p50 {snapshot['p50_ms']:.2f} ms, p99 {snapshot['p99_ms']:.2f} ms, "
+                f"p999 {snapshot['p999_ms']:.2f} ms, max {snapshot['max_ms']:.2f} ms"
+            )
+    
+    def start_reporter(self, interval):
+        """Log a summary every interval seconds from a daemon thread"""
+        if self._reporter is not None:
+            return
+        
+        def report():
+            while True:
+                time.sleep(interval)
+                self.log_summary()
+        
+        self._reporter = threading.Thread(target=report, name='query-metrics', daemon=True)
+        self._reporter.start()
@@ -0,0 +1,87 @@
+import time
+import threading
+
+
+class TokenBucket:
+    """Token bucket that paces work to a (possibly fractional) events-per-second rate"""
+    
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError(f"Rate must be positive, got {rate}")
+        self.rate = rate
+        # Default burst allowance is one second's worth of tokens
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def set_rate(self, rate, capacity=None):
+        """Change the refill rate (and optionally burst size) without losing accumulated tokens"""
+        with self._lock:
+            self._refill()
+            self.rate = max(rate, 1e-6)
+            if capacity is not None:
+                self.capacity = capacity
+                self._tokens = min(self._tokens, capacity)
+    
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    def acquire(self, tokens=1, timeout=None):
+        """Block until tokens are available and take them; returns seconds waited, or None
+        if timeout seconds passed first (nothing is taken then, so the caller can re-plan)"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                # Requests larger than the bucket go through once it is full
+                needed = min(tokens, self.capacity)
+                if self._tokens >= needed:
+                    self._tokens -= tokens
+                    return waited
+                delay = (needed - self._tokens) / self.rate
+            if timeout is not None:
+                if waited >= timeout:
+                    return None
+                delay = min(delay, timeout - waited)
+            # Wake up periodically so rate changes made by set_rate from other threads take effect
+            delay = min(delay, 0.25)
+            time.sleep(delay)
+            waited += delay
+
+
+class LatencyBackoff:
+    """AIMD controller that lowers the admitted rate while database latency is high"""
+    
+    def __init__(self, target_rate, latency_threshold, decrease=0.7, increase=0.05, min_fraction=0.05):
+        self.target_rate = target_rate
+        self.latency_threshold = latency_threshold
+        self.decrease = decrease
+        self.increase = increase
+        self.min_fraction = min_fraction
+        self.fraction = 1.0
+        self.smoothed_latency = None
+    
+    @property
+    def rate(self):
+        """Currently admitted rate"""
+        return self.target_rate * self.fraction
+    
+    def set_target(self, target_rate):
+        """Change the target rate while keeping the current backoff level"""
+        self.target_rate = target_rate
+    
+    def observe(self, latency):
+        """Feed one batch latency in seconds and return the new admitted rate"""
+        if self.smoothed_latency is None:
+            self.smoothed_latency = latency
+        else:
+            self.smoothed_latency = 0.8 * self.smoothed_latency + 0.2 * latency
+        
+        if self.smoothed_latency > self.latency_threshold:
+            self.fraction = max(self.min_fraction, self.fraction * self.decrease)
+        else:
+            self.fraction = min(1.0, self.fraction + self.increase)
+        return self.rate
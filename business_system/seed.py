@@ -0,0 +1,292 @@
+import os
+import time
+import logging
+import argparse
+from contextlib import contextmanager
+import numpy as np
+from dotenv import load_dotenv
+from database_manager import DatabaseManager
+from data_generator import DataGenerator, TWEET_COLUMNS, FOLLOW_COUNT_TRIGGER, LIKE_COUNT_TRIGGER
+
+USER_COLUMNS = ('user_id', 'username', 'email', 'full_name', 'bio')
+FOLLOW_COLUMNS = ('follower_id', 'following_id')
+LIKE_COLUMNS = ('user_id', 'tweet_id')
+
+# Per-row counter triggers from db/init.sql; recomputed in one pass after the load instead
+COUNTER_TRIGGERS = (
+    ('follows', FOLLOW_COUNT_TRIGGER),
+    ('likes', LIKE_COUNT_TRIGGER),
+)
+
+RECOMPUTE_FOLLOW_COUNTS_SQL = """
+    UPDATE users
+    SET followers_count = counts.followers, following_count = counts.following
+    FROM (
+        SELECT users.user_id,
+               COALESCE(followers.n, 0) AS followers,
+               COALESCE(following.n, 0) AS following
+        FROM users
+        LEFT JOIN (
+            SELECT following_id AS user_id, count(*)::int AS n FROM follows GROUP BY following_id
+        ) followers USING (user_id)
+        LEFT JOIN (
+            SELECT follower_id AS user_id, count(*)::int AS n FROM follows GROUP BY follower_id
+        ) following USING (user_id)
+    ) counts
+    WHERE users.user_id = counts.user_id
+      AND (users.followers_count, users.following_count)
+          IS DISTINCT FROM (counts.followers, counts.following)
+"""
+
+RECOMPUTE_TWEET_COUNTS_SQL = """
+    UPDATE tweets
+    SET replies_count = counts.replies, retweets_count = counts.retweets
+    FROM (
+        SELECT tweets.tweet_id,
+               COALESCE(replies.n, 0) AS replies,
+               COALESCE(retweets.n, 0) AS retweets
+        FROM tweets
+        LEFT JOIN (
+            SELECT reply_to_tweet_id AS tweet_id, count(*)::int AS n
+            FROM tweets WHERE reply_to_tweet_id IS NOT NULL GROUP BY reply_to_tweet_id
+        ) replies USING (tweet_id)
+        LEFT JOIN (
+            SELECT original_tweet_id AS tweet_id, count(*)::int AS n
+            FROM tweets WHERE original_tweet_id IS NOT NULL GROUP BY original_tweet_id
+        ) retweets USING (tweet_id)
+    ) counts
+    WHERE tweets.tweet_id = counts.tweet_id
+      AND (tweets.replies_count, tweets.retweets_count)
+          IS DISTINCT FROM (counts.replies, counts.retweets)
+"""
+
+RECOMPUTE_LIKES_COUNTS_SQL = """
+    UPDATE tweets
+    SET likes_count = counts.likes
+    FROM (
+        SELECT tweets.tweet_id, COALESCE(likes.n, 0) AS likes
+        FROM tweets
+        LEFT JOIN (
+            SELECT tweet_id, count(*)::int AS n FROM likes GROUP BY tweet_id
+        ) likes USING (tweet_id)
+    ) counts
+    WHERE tweets.tweet_id = counts.tweet_id
+      AND tweets.likes_count IS DISTINCT FROM counts.likes
+"""
+
+
+class BulkSeeder:
+    """Bulk-loads users, tweets, follows and likes with COPY for snapshot and backfill benchmarks"""
+    
+    def __init__(self, db_manager: DatabaseManager, batch_size=50000):
+        self.db_manager = db_manager
+        self.data_generator = DataGenerator(db_manager)
+        self.batch_size = batch_size
+    
+    def _timed_batches(self, label, total, load_batch):
+        """Call load_batch(size) until total rows are in, logging progress and rows/s"""
+        start = time.monotonic()
+        loaded = 0
+        while loaded < total:
+            inserted = load_batch(min(self.batch_size, total - loaded))
+            if not inserted:
+                # Only happens once nearly every possible pair already exists
+                logging.warning(f"No new {label} in the last batch, stopping at {loaded}")
+                break
+            loaded += inserted
+            elapsed = time.monotonic() - start
+            logging.info(f"Seeded {loaded}/{total} {label} ({loaded / elapsed:.0f} rows/s)")
+        
+        elapsed = time.monotonic() - start
+        logging.info(
+            f"Seeded {loaded} {label} in {elapsed:.1f}s ({loaded / max(elapsed, 1e-9):.0f} rows/s)"
+        )
+        return loaded
+    
+    def _copy_new_rows(self, table, columns, rows, condition=''):
+        """COPY rows into a staging table and move over the ones that don't conflict"""
+        column_list = ', '.join(columns)
+        with self.db_manager.transaction():
+            self.db_manager.execute_query(f"""
+                CREATE TEMP TABLE staging ON COMMIT DROP AS
+                SELECT {column_list} FROM {table} WITH NO DATA
+            """)
+            self.db_manager.copy_rows('staging', columns, rows)
+            result = self.db_manager.execute_query(f"""
+                WITH inserted AS (
+                    INSERT INTO {table} ({column_list})
+                    SELECT DISTINCT {column_list} FROM staging {condition}
+                    ON CONFLICT DO NOTHING
+                    RETURNING 1
+                )
+                SELECT count(*) AS inserted FROM inserted
+            """, fetch=True)
+        return result[0]['inserted']
+    
+    def _table_exists(self, table):
+        result = self.db_manager.execute_query(
+            "SELECT to_regclass(%s) IS NOT NULL AS present", (table,), fetch=True
+        )
+        return result[0]['present']
+    
+    @contextmanager
+    def counter_triggers_disabled(self):
+        """Switch off the per-row counter triggers for the duration of the load"""
+        disabled = []
+        try:
+            for table, trigger in COUNTER_TRIGGERS:
+                if self.db_manager.trigger_exists(table, trigger):
+                    self.db_manager.execute_query(f"ALTER TABLE {table} DISABLE TRIGGER {trigger}")
+                    disabled.append((table, trigger))
+                    logging.info(f"Disabled {trigger} on {table} during the load")
+            yield
+        finally:
+            for table, trigger in disabled:
+                self.db_manager.execute_query(f"ALTER TABLE {table} ENABLE TRIGGER {trigger}")
+                logging.info(f"Re-enabled {trigger} on {table}")
+    
+    def _load_users(self, count):
+        generator = self.data_generator
+        corpus = generator.corpus
+        rng = generator.rng
+        
+        # Reserved IDs make usernames unique without a collision check per row
+        user_ids = self.db_manager.reserve_ids('users', 'user_id', count)
+        bases = corpus.user_names
+        names = corpus.names
+        domains = corpus.email_domains
+        rows = []
+        for user_id, base, name, domain, bio in zip(
+            user_ids,
+            rng.integers(0, len(bases), count).tolist(),
+            rng.integers(0, len(names), count).tolist(),
+            rng.integers(0, len(domains), count).tolist(),
+            corpus.texts(count, 160, rng)
+        ):
+            username = f"{bases[base][:38]}_{user_id}"
+            rows.append((user_id, username, f"{username}@{domains[domain]}", names[name], bio))
+        
+        self.db_manager.copy_rows('users', USER_COLUMNS, rows)
+        generator.add_users(user_ids)
+        return len(rows)
+    
+    def _load_tweets(self, count):
+        generator = self.data_generator
+        # Reply counters are filled in by the recompute pass
+        columns = generator.generate_tweet_batch(count, offline=True)
+        
+        tweet_ids = self.db_manager.reserve_ids('tweets', 'tweet_id', count)
+        rows = zip(tweet_ids, *(columns[column] for column in TWEET_COLUMNS))
+        self.db_manager.copy_rows('tweets', ('tweet_id',) + TWEET_COLUMNS, rows)
+        
+        # Later batches reply to tweets from this one
+        generator.recent_tweet_ids.extend(tweet_ids)
+        return count
+    
+    def _uniform_users(self, count):
+        users = np.frombuffer(self.data_generator.user_ids, dtype=np.int32)
+        return users[self.data_generator.rng.integers(0, len(users), count)]
+    
+    def _load_follows(self, count):
+        # Followers are uniform; followed users are skewed by USER_SKEW_EXPONENT like the generator
+        followers = self._uniform_users(count)
+        following = self.data_generator.pick_users(count)
+        keep = followers != following
+        rows = zip(followers[keep].tolist(), following[keep].tolist())
+        return self._copy_new_rows('follows', FOLLOW_COLUMNS, rows)
+    
+    def _load_likes(self, count, min_tweet_id, max_tweet_id):
+        likers = self._uniform_users(count)
+        tweets = self.data_generator.rng.integers(min_tweet_id, max_tweet_id + 1, count)
+        rows = zip(likers.tolist(), tweets.tolist())
+        # The ID range can have holes from deleted tweets
+        return self._copy_new_rows(
+            'likes', LIKE_COLUMNS, rows,
+            'WHERE EXISTS (SELECT 1 FROM tweets WHERE tweets.tweet_id = staging.tweet_id)'
+        )
+    
+    def recompute_counters(self, with_likes):
+        """Rebuild follower/following, reply, retweet and like counters from the relationship tables"""
+        start = time.monotonic()
+        self.db_manager.execute_query(RECOMPUTE_FOLLOW_COUNTS_SQL)
+        self.db_manager.execute_query(RECOMPUTE_TWEET_COUNTS_SQL)
+        if with_likes:
+            self.db_manager.execute_query(RECOMPUTE_LIKES_COUNTS_SQL)
+        logging.info(f"Recomputed counters in {time.monotonic() - start:.1f}s")
+    
+    def run(self, users, tweets, follows, likes):
+        """Seed the requested number of rows per table and fix up counters"""
+        db_manager = self.db_manager
+        generator = self.data_generator
+        db_manager.init_database()
+        
+        has_likes = self._table_exists('likes')
+        if likes and not has_likes:
+            logging.warning("No likes table (create the schema from db/init.sql), skipping likes")
+            likes = 0
+        
+        generator.user_ids = db_manager.get_user_ids()
+        generator.load_recent_tweet_ids()
+        
+        with self.counter_triggers_disabled():
+            self._timed_batches('users', users, self._load_users)
+            if len(generator.user_ids) < 2:
+                logging.warning("Need at least two users to seed tweets, follows and likes")
+                return
+            
+            self._timed_batches('tweets', tweets, self._load_tweets)
+            self._timed_batches('follows', follows, self._load_follows)
+            
+            if likes:
+                bounds = db_manager.execute_query(
+                    "SELECT min(tweet_id) AS low, max(tweet_id) AS high FROM tweets", fetch=True
+                )[0]
+                if bounds['low'] is None:
+                    logging.warning("No tweets to like, skipping likes")
+                else:
+                    self._timed_batches(
+                        'likes', likes,
+                        lambda count: self._load_likes(count, bounds['low'], bounds['high'])
+                    )
+            
+            self.recompute_counters(has_likes)
+        
+        db_manager.execute_query("ANALYZE users, tweets, follows")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Bulk-load users, tweets, follows and likes with COPY. "
+                    "Counter triggers are disabled while it runs, so stop the generator first."
+    )
+    parser.add_argument('--users', type=int, default=100000, help="users to create")
+    parser.add_argument('--tweets', type=int, default=1000000, help="tweets to create")
+    parser.add_argument('--follows', type=int, default=1000000, help="follow edges to create")
+    parser.add_argument('--likes', type=int, default=0, help="likes to create (needs the likes table)")
+    parser.add_argument('--batch-size', type=int, default=50000, help="rows per COPY")
+    parser.add_argument('--seed', type=int, default=None, help="random seed for reproducible data")
+    return parser.parse_args()
+
+
+def main():
+    """Seeding entry point"""
+    args = parse_args()
+    load_dotenv()
+    logging.basicConfig(
+        level=getattr(logging, os.getenv('LOG_LEVEL', 'INFO').upper()),
+        format='%(asctime)s - %(levelname)s - %(name)s - %(message)s'
+    )
+
+    db_manager = DatabaseManager()
+    db_manager.connect()
+    try:
+        seeder = BulkSeeder(db_manager, batch_size=args.batch_size)
+        if args.seed is not None:
+            seeder.data_generator.seed(args.seed)
+        seeder.run(args.users, args.tweets, args.follows, args.likes)
+    finally:
+        db_manager.disconnect()
+
+
+if __name__ == "__main__":
+    main()
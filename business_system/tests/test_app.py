@@ -0,0 +1,44 @@
+import time
+import threading
+from rate_limiter import TokenBucket, LatencyBackoff
+from workload_profiles import DiurnalProfile
+from app import pace_batches
+
+
+class _Stop(Exception):
+    pass
+
+
+def test_pacing_resumes_after_profile_reaches_zero():
+    # base < amplitude: the rate is 0 from about 1.3s to 2.7s of every 4s period
+    profile = DiurnalProfile(base_rate=50, amplitude=100, period=4)
+    bucket = TokenBucket(50, capacity=5)
+    backoff = LatencyBackoff(50, 1.0)
+    batch_times = []
+    started = time.monotonic()
+    
+    def insert(batch_size, mix):
+        now = time.monotonic() - started
+        batch_times.append(now)
+        if now > 3.0:
+            raise _Stop()
+        return batch_size
+    
+    errors = []
+    
+    def run():
+        try:
+            pace_batches(profile, bucket, backoff, insert, batch_period=0.1, report_interval=3600)
+        except _Stop:
+            pass
+        except Exception as e:
+            errors.append(e)
+    
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout=10)
+    
+    assert not thread.is_alive(), "pacing never resumed after the rate reached zero"
+    assert not errors
+    assert any(t < 1.3 for t in batch_times)
+    assert batch_times[-1] > 3.0
@@ -0,0 +1,22 @@
+from follow_graph import FollowGraph
+
+
+def test_follow_graph_tracks_edges_across_compaction():
+    graph = FollowGraph(compact_ratio=0.5, min_compact=3)
+    graph.load([(1, 2), (3, 4), (5, 6), (1, 2)])
+    assert len(graph) == 3
+    assert graph.contains(1, 2) and not graph.contains(2, 1)
+    
+    graph.discard(3, 4)
+    graph.add(3, 4)
+    graph.discard(5, 6)
+    graph.add(7, 8)
+    graph.add(9, 10)
+    graph.add(2, 1)
+    
+    # Enough changes that the deltas were folded into the sorted array along the way
+    assert len(graph._added) + len(graph._removed) < 4
+    assert len(graph) == 5
+    assert [graph.contains(*pair) for pair in [(1, 2), (3, 4), (5, 6), (7, 8), (9, 10), (2, 1)]] == [
+        True, True, False, True, True, True
+    ]
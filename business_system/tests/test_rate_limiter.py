@@ -0,0 +1,15 @@
+import time
+from rate_limiter import TokenBucket
+
+
+def test_acquire_times_out_without_taking_tokens():
+    bucket = TokenBucket(1e-6, capacity=1.0)
+    bucket.acquire(1)
+    
+    started = time.monotonic()
+    assert bucket.acquire(1, timeout=0.2) is None
+    assert time.monotonic() - started < 1.0
+    
+    bucket.set_rate(1000, capacity=10)
+    assert bucket.acquire(1, timeout=0.5) is not None
+
@@ -0,0 +1,19 @@
+import random
+import numpy as np
+from faker import Faker
+from text_corpus import TextCorpus
+
+
+def test_batched_texts_match_single_text_lengths():
+    fake = Faker()
+    fake.seed_instance(1)
+    random.seed(1)
+    corpus = TextCorpus(fake, sentences=2000, words=10, names=10)
+    
+    single = np.array([len(corpus.text(280)) for _ in range(20000)])
+    batched = np.array([len(text) for text in corpus.texts(20000, 280, np.random.default_rng(1))])
+    
+    assert batched.max() <= 280
+    assert abs(batched.mean() - single.mean()) < 0.03 * single.mean()
+    for q in (0.1, 0.5, 0.9):
+        assert abs(np.quantile(batched, q) - np.quantile(single, q)) < 0.05 * np.quantile(single, q) + 3
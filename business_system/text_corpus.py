@@ -0,0 +1,116 @@
+import sys
+import random
+import logging
+from array import array
+import numpy as np
+
+
+class StringPool:
+    """Immutable pool of strings packed into one buffer with an offsets index"""
+    
+    def __init__(self, strings):
+        self._offsets = array('I', [0])
+        parts = []
+        total = 0
+        for string in strings:
+            parts.append(string)
+            total += len(string)
+            self._offsets.append(total)
+        self._buffer = ''.join(parts)
+        self.lengths = np.diff(np.frombuffer(self._offsets, dtype=np.uint32)).astype(np.int64)
+    
+    def __len__(self):
+        return len(self._offsets) - 1
+    
+    def __getitem__(self, index):
+        return self._buffer[self._offsets[index]:self._offsets[index + 1]]
+    
+    def choice(self):
+        """Return a random string from the pool"""
+        return self[random.randrange(len(self))]
+
+
+class TextCorpus:
+    """Pre-generated pools of sentences, words and names so Faker stays off the hot path"""
+    
+    def __init__(self, fake, sentences=20000, words=5000, names=5000, corpus_file=None):
+        if corpus_file:
+            with open(corpus_file, encoding='utf-8') as source:
+                lines = [line.strip() for line in source if line.strip()]
+            logging.info(f"Loaded {len(lines)} corpus sentences from {corpus_file}")
+        else:
+            lines = [fake.sentence() for _ in range(sentences)]
+        
+        self.sentences = StringPool(lines)
+        # Words and names repeat a lot, so keep them as interned strings
+        self.words = [sys.intern(fake.word()) for _ in range(words)]
+        self.user_names = [sys.intern(fake.user_name()) for _ in range(names)]
+        self.names = [sys.intern(fake.name()) for _ in range(names)]
+        self.email_domains = sorted({fake.free_email_domain() for _ in range(50)})
+        self.locations = sorted({sys.intern(fake.city()) for _ in range(500)})
+        
+        logging.info(
+            f"Text corpus ready: {len(self.sentences)} sentences, {len(self.words)} words, "
+            f"{len(self.names)} names"
+        )
+    
+    def text(self, max_chars):
+        """Join random sentences up to max_chars characters"""
+        sentence = self.sentences.choice()
+        if len(sentence) > max_chars:
+            return sentence[:max_chars - 1].rsplit(' ', 1)[0] + '.'
+        
+        parts = [sentence]
+        length = len(sentence)
+        while True:
+            sentence = self.sentences.choice()
+            if length + 1 + len(sentence) > max_chars:
+                break
+            parts.append(sentence)
+            length += 1 + len(sentence)
+            
+            # Vary tweet length instead of always filling up to the limit
+            if random.random() < 0.3:
+                break
+        return ' '.join(parts)
+    
+    def texts(self, count, max_chars, rng, max_sentences=8):
+        """Vectorized text(): draw sentence indices for count texts at once"""
+        sentences = self.sentences
+        indices = rng.integers(0, len(sentences), (count, max_sentences))
+        
+        # Running length including the joining spaces; a prefix fits while it stays within max_chars
+        running = np.cumsum(sentences.lengths[indices] + 1, axis=1) - 1
+        fitting = (running <= max_chars).sum(axis=1)
+        # Same stopping rule as text(): the first sentence, then always a second attempt, and after
+        # each further sentence that fits another attempt with probability 0.7
+        wanted = 1 + rng.geometric(0.3, count)
+        taken = np.minimum(fitting, wanted)
+        
+        texts = []
+        for row, n in zip(indices.tolist(), taken.tolist()):
+            if n == 0:
+                texts.append(self.text(max_chars))
+            else:
+                texts.append(' '.join([sentences[i] for i in row[:n]]))
+        return texts
+    
+    def word(self):
+        """Return a random word"""
+        return random.choice(self.words)
+    
+    def name(self):
+        """Return a random full name"""
+        return random.choice(self.names)
+    
+    def user_name(self):
+        """Return a random user name with a numeric suffix to keep collisions rare"""
+        return f"{random.choice(self.user_names)}{random.randrange(1000000)}"
+    
+    def location(self):
+        """Return a random city name"""
+        return random.choice(self.locations)
+    
+    def email(self, user_name):
+        """Return an email address for the given user name"""
+        return f"{user_name}@{random.choice(self.email_domains)}"
@@ -0,0 +1,207 @@
+import os
+import csv
+import json
+import math
+import bisect
+
+DEFAULT_EVENT_MIX = {
+    'tweet': 0.45, 'follow': 0.15, 'like': 0.2, 'retweet': 0.08,
+    'edit': 0.05, 'unfollow': 0.03, 'unlike': 0.02, 'delete': 0.02,
+}
+
+
+class WorkloadProfile:
+    """Base class for a time-varying target rate and event mix"""
+    
+    def __init__(self, mix=None, duration=None, loop=False):
+        self.mix = dict(mix or DEFAULT_EVENT_MIX)
+        self.duration = duration
+        self.loop = loop
+    
+    def _position(self, elapsed):
+        """Map wall-clock seconds since start onto the profile timeline"""
+        if self.duration and self.loop:
+            return elapsed % self.duration
+        if self.duration:
+            return min(elapsed, self.duration)
+        return elapsed
+    
+    def rate_at(self, elapsed):
+        """Target events per second after elapsed seconds"""
+        return self._rate(self._position(elapsed))
+    
+    def mix_at(self, elapsed):
+        """Event type weights after elapsed seconds"""
+        return self._mix(self._position(elapsed))
+    
+    def _rate(self, position):
+        raise NotImplementedError
+    
+    def _mix(self, position):
+        return self.mix
+
+
+class ConstantProfile(WorkloadProfile):
+    """Flat rate, equivalent to plain rate mode"""
+    
+    def __init__(self, rate, **kwargs):
+        super().__init__(**kwargs)
+        self.rate = rate
+    
+    def _rate(self, position):
+        return self.rate
+
+
+class StepRampProfile(WorkloadProfile):
+    """Sequence of fixed-rate steps, e.g. a staircase ramp test"""
+    
+    def __init__(self, steps, **kwargs):
+        if not steps:
+            raise ValueError("A ramp profile needs at least one step")
+        kwargs.setdefault('duration', sum(step['duration'] for step in steps))
+        super().__init__(**kwargs)
+        self.steps = steps
+        self._ends = []
+        end = 0
+        for step in steps:
+            end += step['duration']
+            self._ends.append(end)
+    
+    def _step(self, position):
+        index = bisect.bisect_right(self._ends, position)
+        return self.steps[min(index, len(self.steps) - 1)]
+    
+    def _rate(self, position):
+        return self._step(position)['rate']
+    
+    def _mix(self, position):
+        return self._step(position).get('mix', self.mix)
+
+
+class DiurnalProfile(WorkloadProfile):
+    """Sinusoidal daily curve peaking at peak_offset seconds into each period"""
+    
+    def __init__(self, base_rate, amplitude, period=86400, peak_offset=0, **kwargs):
+        super().__init__(**kwargs)
+        self.base_rate = base_rate
+        self.amplitude = amplitude
+        self.period = period
+        self.peak_offset = peak_offset
+    
+    def _rate(self, position):
+        angle = 2 * math.pi * (position - self.peak_offset) / self.period
+        return max(0.0, self.base_rate + self.amplitude * math.cos(angle))
+
+
+class BurstProfile(WorkloadProfile):
+    """Steady baseline with recurring flash-crowd spikes"""
+    
+    def __init__(self, base_rate, burst_rate, burst_start, burst_duration,
+                 every=None, burst_mix=None, **kwargs):
+        super().__init__(**kwargs)
+        self.base_rate = base_rate
+        self.burst_rate = burst_rate
+        self.burst_start = burst_start
+        self.burst_duration = burst_duration
+        self.every = every
+        self.burst_mix = burst_mix
+    
+    def _in_burst(self, position):
+        offset = position - self.burst_start
+        if offset < 0:
+            return False
+        if self.every:
+            offset %= self.every
+        return offset < self.burst_duration
+    
+    def _rate(self, position):
+        return self.burst_rate if self._in_burst(position) else self.base_rate
+    
+    def _mix(self, position):
+        if self.burst_mix and self._in_burst(position):
+            return self.burst_mix
+        return self.mix
+
+
+class ReplayProfile(WorkloadProfile):
+    """Replays a recorded (offset_seconds, rate[, mix]) timeline, holding each rate until the next point"""
+    
+    def __init__(self, timeline, **kwargs):
+        if not timeline:
+            raise ValueError("A replay profile needs at least one timeline point")
+        timeline = sorted(timeline, key=lambda point: point[0])
+        kwargs.setdefault('duration', timeline[-1][0])
+        super().__init__(**kwargs)
+        self.timeline = timeline
+        self._offsets = [point[0] for point in timeline]
+    
+    def _point(self, position):
+        index = bisect.bisect_right(self._offsets, position) - 1
+        return self.timeline[max(index, 0)]
+    
+    def _rate(self, position):
+        return self._point(position)[1]
+    
+    def _mix(self, position):
+        point = self._point(position)
+        return point[2] if len(point) > 2 and point[2] else self.mix
+
+
+def _read_timeline(path):
+    """Read a replay timeline from a CSV file with offset_seconds,rate columns"""
+    with open(path, newline='') as timeline_file:
+        return [
+            (float(row['offset_seconds']), float(row['rate']))
+            for row in csv.DictReader(timeline_file)
+        ]
+
+
+PROFILE_TYPES = {
+    'constant': ConstantProfile,
+    'ramp': StepRampProfile,
+    'diurnal': DiurnalProfile,
+    'burst': BurstProfile,
+    'replay': ReplayProfile,
+}
+
+
+def parse_event_mix(text):
+    """Parse an event mix like 'tweet:0.6,follow:0.3,delete:0.1' into a weights dict"""
+    mix = {}
+    for part in text.split(','):
+        kind, _, weight = part.partition(':')
+        mix[kind.strip()] = float(weight)
+    return mix
+
+
+def event_mix_from_env():
+    """The EVENT_MIX environment variable as a weights dict, or the default mix"""
+    text = os.getenv('EVENT_MIX')
+    return parse_event_mix(text) if text else dict(DEFAULT_EVENT_MIX)
+
+
+def build_profile(spec, default_mix=None):
+    """Build a workload profile from its declarative dict form"""
+    spec = dict(spec)
+    if default_mix and 'mix' not in spec:
+        spec['mix'] = default_mix
+    profile_type = spec.pop('type', None)
+    if profile_type not in PROFILE_TYPES:
+        raise ValueError(f"Unknown workload profile type: {profile_type}")
+    
+    if profile_type == 'replay' and 'timeline_file' in spec:
+        spec['timeline'] = _read_timeline(spec.pop('timeline_file'))
+    
+    return PROFILE_TYPES[profile_type](**spec)
+
+
+def load_profile(path, default_mix=None):
+    """Load a workload profile from a JSON file"""
+    with open(path) as profile_file:
+        spec = json.load(profile_file)
+    
+    # Timeline files are resolved relative to the profile that references them
+    if 'timeline_file' in spec:
+        spec['timeline_file'] = os.path.join(os.path.dirname(path), spec['timeline_file'])
+    
+    return build_profile(spec, default_mix)
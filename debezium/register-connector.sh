@@ -21,6 +21,47 @@ if curl -f http://debezium:8083/connectors/twitter-postgres-connector 2>/dev/nul
   sleep 2
 fi
 
+# Bare JSON payloads by default, parsed with a registered schema; set
+# DEBEZIUM_VALUE_SCHEMAS_ENABLE=true to embed the Kafka Connect schema in every message so
+# consumers follow schema changes on their own, at several times the message size
+VALUE_SCHEMAS_ENABLE=${DEBEZIUM_VALUE_SCHEMAS_ENABLE:-false}
+
+# envelope: full change events with before/after/source; unwrapped: only the new row image plus
+# __op and __deleted, about half the bytes per message (set CDC_FORMAT in spark/.env to match)
+CDC_FORMAT=${DEBEZIUM_CDC_FORMAT:-envelope}
+if [ "$CDC_FORMAT" = "unwrapped" ]; then
+  TRANSFORMS='"transforms": "unwrap,route",
+    "transforms.unwrap.type": "io.debezium.transforms.ExtractNewRecordState",
+    "transforms.unwrap.add.fields": "op",
+    "transforms.unwrap.delete.tombstone.handling.mode": "rewrite",'
+else
+  TRANSFORMS='"transforms": "route",'
+fi
+
+# json: text messages; avro: compact binary messages whose schemas are registered in Apicurio
+# (start it with the "avro" compose profile; set CDC_SERIALIZATION in spark/.env to match)
+SERIALIZATION=${DEBEZIUM_SERIALIZATION:-json}
+APICURIO_URL=${APICURIO_REGISTRY_URL:-http://apicurio:8080/apis/registry/v2}
+if [ "$SERIALIZATION" = "avro" ]; then
+  # Confluent framing puts a magic byte and the 4-byte content id in front of each message
+  CONVERTERS=""
+  for side in key value; do
+    CONVERTERS="${CONVERTERS}\"${side}.converter\": \"io.apicurio.registry.utils.converter.AvroConverter\",
+    \"${side}.converter.apicurio.registry.url\": \"${APICURIO_URL}\",
+    \"${side}.converter.apicurio.registry.auto-register\": \"true\",
+    \"${side}.converter.apicurio.registry.find-latest\": \"true\",
+    \"${side}.converter.apicurio.registry.headers.enabled\": \"false\",
+    \"${side}.converter.apicurio.registry.as-confluent\": \"true\",
+    \"${side}.converter.apicurio.registry.use-id\": \"contentId\",
+    "
+  done
+else
+  CONVERTERS='"key.converter": "org.apache.kafka.connect.json.JsonConverter",
+    "value.converter": "org.apache.kafka.connect.json.JsonConverter",
+    "key.converter.schemas.enable": "false",
+    "value.converter.schemas.enable": "'"${VALUE_SCHEMAS_ENABLE}"'",'
+fi
+
 # Create connector config with substituted environment variables
 cat > /tmp/connector-config.json <<EOF
 {
@@ -40,11 +81,8 @@ cat > /tmp/connector-config.json <<EOF
     "publication.autocreate.mode": "filtered",
     "schema.history.internal.kafka.bootstrap.servers": "kafka:9092",
     "schema.history.internal.kafka.topic": "twitter.schema.history",
-    "key.converter": "org.apache.kafka.connect.json.JsonConverter",
-    "value.converter": "org.apache.kafka.connect.json.JsonConverter",
-    "key.converter.schemas.enable": "false",
-    "value.converter.schemas.enable": "false",
-    "transforms": "route",
+    ${CONVERTERS}
+    ${TRANSFORMS}
     "transforms.route.type": "org.apache.kafka.connect.transforms.RegexRouter",
     "transforms.route.regex": "([^.]+)\\\\.([^.]+)\\\\.([^.]+)",
     "transforms.route.replacement": "twitter.\$3"
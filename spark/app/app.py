@@ -1,7 +1,62 @@
-from pyspark.sql import SparkSession
-from pyspark.sql.functions import col, from_json
-from pyspark.sql.types import StructType, StructField, IntegerType, StringType, LongType, BooleanType, ArrayType
+from functools import reduce
+from pyspark.sql import DataFrame, SparkSession
+from pyspark.sql.avro.functions import from_avro
+from pyspark.sql.functions import (
+    col, conv, expr, from_json, hex, hour, lit, struct, substring, timestamp_micros, to_date, xxhash64
+)
+from pyspark.sql.types import StructType, StructField, StringType
+from schema_registry import SchemaRegistry, ApicurioClient, BatchLog, envelope_field, unwrapped_row
+from batch_sizing import BatchSizeController
 import os
+import json
+import time
+import logging
+
+logging.basicConfig(
+    level=getattr(logging, os.getenv("LOG_LEVEL", "INFO").upper()),
+    format="%(asctime)s - %(levelname)s - %(name)s - %(message)s"
+)
+logger = logging.getLogger("tweets_stream")
+
+TOPIC = "twitter.tweets"
+OUTPUT_PATH = os.getenv("OUTPUT_PATH", "s3a://spark-output/cdc/tweets")
+# A new OUTPUT_PATH needs a new CHECKPOINT_LOCATION too, or already processed offsets are skipped
+CHECKPOINT_LOCATION = os.getenv("CHECKPOINT_LOCATION", "/opt/spark/output/checkpoints/cdc/tweets")
+BATCH_LOG_PATH = os.path.join(f"{CHECKPOINT_LOCATION.rstrip('/')}-sink", "last_batch_id")
+
+# By default payloads are parsed with the newest registered schema. With
+# value.converter.schemas.enable=true every Debezium message carries its own schema
+# ({"schema": ..., "payload": ...}), which new registry versions are derived from
+CDC_SCHEMAS_ENABLE = os.getenv("CDC_SCHEMAS_ENABLE", "false").lower() == "true"
+
+# envelope: full Debezium change events (before/after/source/op); unwrapped: flat rows produced by
+# the connector's ExtractNewRecordState transform, with the operation in __op (DEBEZIUM_CDC_FORMAT)
+CDC_FORMAT = os.getenv("CDC_FORMAT", "envelope").lower()
+if CDC_FORMAT not in ("envelope", "unwrapped"):
+    raise ValueError(f"Invalid CDC_FORMAT: {CDC_FORMAT} (expected envelope or unwrapped)")
+
+# json: text messages decoded with from_json; avro: binary messages whose writer schemas live in
+# an Apicurio registry (DEBEZIUM_SERIALIZATION), decoded with from_avro
+CDC_SERIALIZATION = os.getenv("CDC_SERIALIZATION", "json").lower()
+if CDC_SERIALIZATION not in ("json", "avro"):
+    raise ValueError(f"Invalid CDC_SERIALIZATION: {CDC_SERIALIZATION} (expected json or avro)")
+
+# Micro-batch sizing: MAX_OFFSETS_PER_TRIGGER caps every batch (the worker has 2g of memory);
+# with ADAPTIVE_BATCH_SIZING the limit follows measured throughput below that cap
+TRIGGER_INTERVAL_SECONDS = int(os.getenv("TRIGGER_INTERVAL_SECONDS", "5"))
+MAX_OFFSETS_PER_TRIGGER = int(os.getenv("MAX_OFFSETS_PER_TRIGGER", "200000"))
+MIN_OFFSETS_PER_TRIGGER = int(os.getenv("MIN_OFFSETS_PER_TRIGGER") or "0")
+MAX_TRIGGER_DELAY = os.getenv("MAX_TRIGGER_DELAY", "30s")
+ADAPTIVE_BATCH_SIZING = os.getenv("ADAPTIVE_BATCH_SIZING", "true").lower() == "true"
+ADAPTIVE_MIN_OFFSETS = int(os.getenv("ADAPTIVE_MIN_OFFSETS", "1000"))
+ADAPTIVE_INITIAL_OFFSETS = int(os.getenv("ADAPTIVE_INITIAL_OFFSETS", "20000"))
+# The Kafka source needs minOffsetsPerTrigger <= maxOffsetsPerTrigger, so the adaptive limit
+# never goes below the minimum batch either
+if MIN_OFFSETS_PER_TRIGGER > MAX_OFFSETS_PER_TRIGGER:
+    raise ValueError(
+        f"MIN_OFFSETS_PER_TRIGGER ({MIN_OFFSETS_PER_TRIGGER}) exceeds "
+        f"MAX_OFFSETS_PER_TRIGGER ({MAX_OFFSETS_PER_TRIGGER})"
+    )
 
 # 1) Create Spark session with MinIO (S3) configuration
 spark = (
@@ -12,62 +67,263 @@ spark = (
     .config("spark.hadoop.fs.s3a.secret.key", os.getenv("MINIO_SECRET_KEY"))
     .config("spark.hadoop.fs.s3a.path.style.access", "true")
     .config("spark.hadoop.fs.s3a.impl", "org.apache.hadoop.fs.s3a.S3AFileSystem")
+    # Debezium sends TIMESTAMP columns as microseconds of the database's wall-clock time
+    .config("spark.sql.session.timeZone", "UTC")
     .getOrCreate()
 )
 spark.sparkContext.setLogLevel("WARN")
 
-# 2) Define schema for Debezium CDC format - the "after" field contains tweet data
-after_schema = StructType([
-    StructField("tweet_id", IntegerType(), True),
-    StructField("user_id", IntegerType(), True),
-    StructField("content", StringType(), True),
-    StructField("hashtags", ArrayType(StringType()), True),
-    StructField("mentions", ArrayType(StringType()), True),
-    StructField("likes_count", IntegerType(), True),
-    StructField("retweets_count", IntegerType(), True),
-    StructField("replies_count", IntegerType(), True),
-    StructField("reply_to_tweet_id", IntegerType(), True),
-    StructField("is_retweet", BooleanType(), True),
-    StructField("original_tweet_id", IntegerType(), True),
-    StructField("location", StringType(), True),
-    StructField("created_at", LongType(), True),
-    StructField("updated_at", LongType(), True)
-])
-
-debezium_schema = StructType([
-    StructField("after", after_schema, True),
-    StructField("op", StringType(), True)
-])
-
-# 3) Read stream from Kafka
-df_raw = (
-    spark.readStream
-    .format("kafka")
-    .option("kafka.bootstrap.servers", "kafka:9092")
-    .option("subscribe", "twitter.tweets")
-    .option("startingOffsets", "earliest")
-    .load()
+# 2) The tweet schema comes from a file-backed registry: seeded from schemas/ next to this
+# script and evolved (new columns only) from the schema Debezium embeds in each message,
+# or from the Avro writer schemas
+registry = SchemaRegistry(
+    os.getenv("SCHEMA_REGISTRY_DIR", "/opt/spark/output/schemas"),
+    seed_directory=os.path.join(os.path.dirname(os.path.abspath(__file__)), "schemas")
 )
+batch_log = BatchLog(BATCH_LOG_PATH)
+apicurio = ApicurioClient(os.getenv("APICURIO_REGISTRY_URL", "http://apicurio:8080/apis/registry/v2"))
 
-# 4) Parse the Kafka value (Debezium CDC format) and extract the "after" field
-df_parsed = (
-    df_raw
-    .selectExpr("CAST(value AS STRING) AS json_str")
-    .select(from_json(col("json_str"), debezium_schema).alias("cdc"))
-    .filter(col("cdc.op").isin("c", "r", "u"))  # create, read, update operations
-    .select("cdc.after.*")
-)
+version, after_schema = registry.latest(TOPIC)
+if after_schema is None and CDC_SERIALIZATION == "json" and not CDC_SCHEMAS_ENABLE:
+    raise RuntimeError(f"No registered schema for {TOPIC}; enable CDC_SCHEMAS_ENABLE or add one to the registry")
+logger.info(f"Starting with {TOPIC} schema version {version}")
 
-# 5) Write to MinIO as Parquet with checkpointing
-query_minio = (
-    df_parsed.writeStream
-    .format("parquet")
-    .option("path", "s3a://spark-output/tweets")
-    .option("checkpointLocation", "/opt/spark/output/checkpoints/tweets")
-    .outputMode("append")
-    .trigger(processingTime="5 seconds")
-    .start()
-)
+# Schemas already merged into the registry, by hash of the embedded schema JSON or by Avro schema id
+known_schemas = set()
+
+
+def parse(batch_df, after_schema):
+    """Parse Debezium messages into (schema_hash, op, after) rows, after being the new row image"""
+    after_schema = after_schema or StructType([])
+    if CDC_FORMAT == "unwrapped":
+        # Only the row columns and __op are parsed; __deleted just repeats op == 'd'
+        payload = StructType(after_schema.fields + [StructField("__op", StringType(), True)])
+        columns = [
+            col("payload.__op").alias("op"),
+            struct(*[col(f"payload.`{name}`") for name in after_schema.fieldNames()]).alias("after")
+        ]
+    else:
+        payload = StructType([
+            StructField("after", after_schema, True),
+            StructField("op", StringType(), True)
+        ])
+        columns = [col("payload.op").alias("op"), col("payload.after").alias("after")]
+
+    if not CDC_SCHEMAS_ENABLE:
+        return batch_df.select(from_json(col("json_str"), payload).alias("payload")).select(*columns)
+
+    # Parsing the schema as a string keeps its raw JSON, which is hashed instead of compared
+    message = StructType([
+        StructField("schema", StringType(), True),
+        StructField("payload", payload, True)
+    ])
+    return (
+        batch_df
+        .select(from_json(col("json_str"), message).alias("message"))
+        .select(xxhash64(col("message.schema")).alias("schema_hash"), col("message.payload").alias("payload"))
+        .select("schema_hash", *columns)
+    )
+
+
+def row_schema(schema):
+    """Row columns described by an embedded Debezium schema"""
+    if CDC_FORMAT == "unwrapped":
+        return unwrapped_row(schema)
+    return envelope_field(schema)
+
+
+def register(row_type):
+    """Merge a writer's row columns into the registry and make the result the current schema"""
+    global version, after_schema
+    new_version, after_schema = registry.register(TOPIC, row_type)
+    if new_version != version:
+        logger.info(f"Registered {TOPIC} schema version {new_version}: {after_schema.simpleString()}")
+        version = new_version
+
+
+def evolve_schema(batch_df, hashes):
+    """Merge the embedded schemas with the given hashes into the registry"""
+    schemas = (
+        batch_df
+        .select(from_json(col("json_str"), StructType([StructField("schema", StringType(), True)])).alias("message"))
+        .select(xxhash64(col("message.schema")).alias("schema_hash"), col("message.schema").alias("schema"))
+        .where(col("schema").isNotNull() & col("schema_hash").isin(hashes))
+        .dropDuplicates(["schema_hash"])
+        .collect()
+    )
+    for row in schemas:
+        register(row_schema(json.loads(row.schema)))
+    known_schemas.update(hashes)
+
+
+def parse_json(batch_df):
+    """Parse a JSON micro-batch, evolving the registry first if it carries new embedded schemas.
+    Returns the frame to unpersist afterwards and the (op, after) rows."""
+    parsed = parse(batch_df, after_schema)
+    if not CDC_SCHEMAS_ENABLE:
+        return parsed, parsed
+
+    # One small distinct over hashes per batch; messages are re-parsed only after a migration
+    parsed = parsed.persist()
+    hashes = [row.schema_hash for row in parsed.select("schema_hash").distinct().collect()]
+    unknown = [h for h in hashes if h not in known_schemas]
+    if unknown:
+        previous = after_schema
+        evolve_schema(batch_df, unknown)
+        if after_schema != previous:
+            parsed.unpersist()
+            parsed = parse(batch_df, after_schema).persist()
+    return parsed, parsed
+
+
+def align(rows, row_type):
+    """Project (op, after) rows onto the current registry columns; columns the writer lacks are null"""
+    present = set(row_type.fieldNames())
+    return rows.select("op", struct(*[
+        col(f"after.`{field.name}`") if field.name in present else lit(None).cast(field.dataType).alias(field.name)
+        for field in after_schema.fields
+    ]).alias("after"))
+
+
+def parse_avro(batch_df):
+    """Decode an Avro micro-batch with one from_avro per writer schema in it.
+    Returns the frame to unpersist afterwards and the (op, after) rows, or None if it was empty."""
+    # Messages are framed as a zero magic byte and the 4-byte Apicurio content id of the writer schema
+    framed = (
+        batch_df
+        .where(col("value").isNotNull())  # tombstones after deletes
+        .select(
+            conv(hex(substring(col("value"), 2, 4)), 16, 10).cast("int").alias("schema_id"),
+            expr("substring(value, 6)").alias("avro")
+        )
+        .persist()
+    )
+    schema_ids = [row.schema_id for row in framed.select("schema_id").distinct().collect()]
+
+    decoded = []
+    for schema_id in schema_ids:
+        rows = framed.where(col("schema_id") == schema_id).select(
+            from_avro(col("avro"), apicurio.schema(schema_id)).alias("payload")
+        )
+        payload_type = rows.schema["payload"].dataType
+        if CDC_FORMAT == "unwrapped":
+            row_type = StructType([field for field in payload_type.fields if not field.name.startswith("__")])
+            rows = rows.select(
+                col("payload.__op").alias("op"),
+                struct(*[col(f"payload.`{name}`") for name in row_type.fieldNames()]).alias("after")
+            )
+        else:
+            row_type = payload_type["after"].dataType
+            rows = rows.select(col("payload.op").alias("op"), col("payload.after").alias("after"))
+        if schema_id not in known_schemas:
+            register(row_type)
+            known_schemas.add(schema_id)
+        decoded.append((rows, row_type))
+
+    # Aligned only once every writer schema is registered, so all of them share the newest columns
+    aligned = [align(rows, row_type) for rows, row_type in decoded]
+    return framed, reduce(DataFrame.unionByName, aligned) if aligned else None
+
+
+def write_batch(batch_df, batch_id):
+    """Parse one micro-batch with the current registry schema and append it as Parquet"""
+    if batch_id <= batch_log.last_batch_id():
+        logger.info(f"Skipping batch {batch_id}, already written")
+        return
+
+    if CDC_SERIALIZATION == "avro":
+        cached, parsed = parse_avro(batch_df)
+    else:
+        cached, parsed = parse_json(batch_df)
+
+    if parsed is not None:
+        # Partitioned by the hour the tweet was created, so time-bounded queries prune whole
+        # directories; one writer per hour keeps it to one file per hour and batch
+        created_at = timestamp_micros(col("after.created_at"))
+        (
+            parsed
+            .filter(col("op").isin("c", "r", "u"))  # create, read, update operations
+            .select("after.*", to_date(created_at).alias("event_date"), hour(created_at).alias("event_hour"))
+            .repartition("event_date", "event_hour")
+            .write
+            .mode("append")
+            .partitionBy("event_date", "event_hour")
+            .parquet(OUTPUT_PATH)
+        )
+    cached.unpersist()
+    batch_log.commit(batch_id)
+
+
+# 3) Read stream from Kafka, at most max_offsets records per micro-batch so catching up after
+# downtime cannot pull the whole backlog into one batch
+def start_query(max_offsets):
+    reader = (
+        spark.readStream
+        .format("kafka")
+        .option("kafka.bootstrap.servers", "kafka:9092")
+        .option("subscribe", TOPIC)
+        .option("startingOffsets", "earliest")
+        .option("maxOffsetsPerTrigger", max_offsets)
+    )
+    # Optionally wait for a minimum batch, but never longer than MAX_TRIGGER_DELAY
+    if MIN_OFFSETS_PER_TRIGGER:
+        reader = reader.option("minOffsetsPerTrigger", MIN_OFFSETS_PER_TRIGGER)
+        reader = reader.option("maxTriggerDelay", MAX_TRIGGER_DELAY)
+    df_raw = reader.load()
+
+    # 4) Decode each micro-batch (Debezium CDC envelopes or unwrapped rows, as JSON or Avro) and write it
+    # to MinIO as Parquet with checkpointing. Batches are written with the newest registered schema,
+    # so files only ever gain columns and the output can be read with spark.read.option("mergeSchema", "true")
+    if CDC_SERIALIZATION == "avro":
+        df_messages = df_raw.select("value")
+    else:
+        df_messages = df_raw.selectExpr("CAST(value AS STRING) AS json_str")
+
+    return (
+        df_messages
+        .writeStream
+        .foreachBatch(write_batch)
+        .option("checkpointLocation", CHECKPOINT_LOCATION)
+        .trigger(processingTime=f"{TRIGGER_INTERVAL_SECONDS} seconds")
+        .start()
+    )
+
+
+controller = None
+max_offsets = MAX_OFFSETS_PER_TRIGGER
+if ADAPTIVE_BATCH_SIZING:
+    controller = BatchSizeController(
+        TRIGGER_INTERVAL_SECONDS,
+        max(ADAPTIVE_MIN_OFFSETS, MIN_OFFSETS_PER_TRIGGER),
+        MAX_OFFSETS_PER_TRIGGER,
+        ADAPTIVE_INITIAL_OFFSETS
+    )
+    max_offsets = controller.size
+query_minio = start_query(max_offsets)
+
+# 5) Resize batches from each new progress report, then wait for termination
+last_batch_id = None
+while controller is not None and not query_minio.awaitTermination(TRIGGER_INTERVAL_SECONDS):
+    progress = query_minio.lastProgress
+    if progress is None or progress["batchId"] == last_batch_id:
+        continue
+    last_batch_id = progress["batchId"]
+    new_size = controller.observe(progress)
+    if new_size is None:
+        continue
+
+    # Source options are fixed while a query runs, so restart it between two batches;
+    # the checkpoint makes it resume from the same offsets
+    while query_minio.status["isTriggerActive"]:
+        time.sleep(0.1)
+    query_minio.stop()
+    logger.info(
+        f"Resizing micro-batches from {max_offsets} to {new_size} offsets "
+        f"({progress['numInputRows']} rows in {progress['durationMs']['triggerExecution']} ms)"
+    )
+    max_offsets = new_size
+    controller.restarted()
+    last_batch_id = None
+    query_minio = start_query(max_offsets)
 
-# 6) Wait for termination
 query_minio.awaitTermination()
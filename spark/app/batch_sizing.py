@@ -0,0 +1,57 @@
+class BatchSizeController:
+    """Adapts maxOffsetsPerTrigger so that a full micro-batch takes about target_utilization of the
+    trigger interval: large enough to catch up quickly after an outage, never above max_offsets"""
+    
+    def __init__(self, trigger_seconds, min_offsets, max_offsets, initial_offsets,
+                 target_utilization=0.8, max_growth=2.0, smoothing=0.5, min_change=0.2):
+        if not 0 < min_offsets <= max_offsets:
+            raise ValueError(f"Invalid batch size bounds: min={min_offsets}, max={max_offsets}")
+        self.trigger_seconds = trigger_seconds
+        self.min_offsets = min_offsets
+        self.max_offsets = max_offsets
+        self.target_utilization = target_utilization
+        self.max_growth = max_growth
+        self.smoothing = smoothing
+        self.min_change = min_change
+        self.size = self._clamp(initial_offsets)
+        # Smoothed throughput of full batches in rows per second
+        self.rate = None
+        self._warming_up = True
+    
+    def _clamp(self, size):
+        return int(max(self.min_offsets, min(self.max_offsets, size)))
+    
+    def restarted(self):
+        """The query was restarted with self.size; its first batch also pays for query startup"""
+        self._warming_up = True
+    
+    def observe(self, progress):
+        """Feed one StreamingQueryProgress (as a dict) and return the new batch size if it moved by
+        at least min_change, or None to keep the current one"""
+        rows = progress.get("numInputRows", 0)
+        seconds = progress.get("durationMs", {}).get("triggerExecution", 0) / 1000
+        if self._warming_up:
+            self._warming_up = False
+            return None
+        if rows <= 0 or seconds <= 0:
+            return None
+        
+        # A batch well below the limit was bounded by the data available, not by the limit,
+        # and says little about throughput unless it still overran the trigger
+        if rows < self.size / 2 and seconds <= self.trigger_seconds:
+            return None
+        
+        rate = rows / seconds
+        if self.rate is None or seconds > self.trigger_seconds:
+            # An overrun batch resets the estimate, so the next limit shrinks at once
+            self.rate = rate
+        else:
+            self.rate = self.smoothing * rate + (1 - self.smoothing) * self.rate
+        # Grow at most max_growth per batch, since throughput measured at one size need not hold at the next
+        target = min(self.rate * self.trigger_seconds * self.target_utilization, self.size * self.max_growth)
+        target = self._clamp(target)
+        
+        if abs(target - self.size) < self.size * self.min_change:
+            return None
+        self.size = target
+        return target
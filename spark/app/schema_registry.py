@@ -0,0 +1,171 @@
+import os
+import json
+import time
+import urllib.request
+from pyspark.sql.types import (
+    StructType, StructField, ArrayType, MapType,
+    ByteType, ShortType, IntegerType, LongType, FloatType, DoubleType, BooleanType, StringType
+)
+
+# Kafka Connect primitive types as produced by Debezium's JsonConverter. Logical types such as
+# io.debezium.time.MicroTimestamp keep their physical type so existing Parquet columns stay stable.
+# Bytes (and Decimal) values are base64 text in JSON.
+CONNECT_TYPES = {
+    'int8': ByteType(),
+    'int16': ShortType(),
+    'int32': IntegerType(),
+    'int64': LongType(),
+    'float32': FloatType(),
+    'float64': DoubleType(),
+    'boolean': BooleanType(),
+    'string': StringType(),
+    'bytes': StringType(),
+}
+
+
+class SchemaEvolutionError(Exception):
+    """Raised when a new schema version is not an additive change of the registered one"""
+
+
+def connect_to_spark(schema):
+    """Convert a Kafka Connect JSON schema to the equivalent Spark data type"""
+    kind = schema['type']
+    if kind == 'struct':
+        return StructType([
+            StructField(field['field'], connect_to_spark(field), field.get('optional', True))
+            for field in schema['fields']
+        ])
+    if kind == 'array':
+        return ArrayType(connect_to_spark(schema['items']), schema['items'].get('optional', True))
+    if kind == 'map':
+        return MapType(StringType(), connect_to_spark(schema['values']), schema['values'].get('optional', True))
+    if kind not in CONNECT_TYPES:
+        raise ValueError(f"Unsupported Kafka Connect type: {kind}")
+    return CONNECT_TYPES[kind]
+
+
+def envelope_field(envelope, name='after'):
+    """Spark type of one field (e.g. the row image) of a Debezium envelope schema"""
+    for field in envelope['fields']:
+        if field['field'] == name:
+            return connect_to_spark(field)
+    raise ValueError(f"Debezium envelope schema has no '{name}' field")
+
+
+def unwrapped_row(schema):
+    """Spark type of a row flattened by ExtractNewRecordState, without its __op/__deleted fields"""
+    row = connect_to_spark(schema)
+    return StructType([field for field in row.fields if not field.name.startswith('__')])
+
+
+def evolve(current, incoming, path=''):
+    """Merge incoming into current: existing columns keep their order and type, new ones are
+    appended as nullable, dropped ones are kept. Any type change raises SchemaEvolutionError,
+    because Parquet files written with the old type could no longer be read together."""
+    if isinstance(current, StructType) and isinstance(incoming, StructType):
+        incoming_fields = {field.name: field for field in incoming.fields}
+        fields = []
+        for field in current.fields:
+            if field.name in incoming_fields:
+                data_type = evolve(field.dataType, incoming_fields.pop(field.name).dataType, f"{path}{field.name}.")
+                fields.append(StructField(field.name, data_type, True))
+            else:
+                fields.append(field)
+        fields.extend(StructField(field.name, field.dataType, True) for field in incoming.fields if field.name in incoming_fields)
+        return StructType(fields)
+    if isinstance(current, ArrayType) and isinstance(incoming, ArrayType):
+        return ArrayType(evolve(current.elementType, incoming.elementType, path), True)
+    if current != incoming:
+        raise SchemaEvolutionError(
+            f"Column {path.rstrip('.') or '<root>'} changed type from "
+            f"{current.simpleString()} to {incoming.simpleString()}"
+        )
+    return current
+
+
+class SchemaRegistry:
+    """File-backed registry of versioned Spark schemas, one JSON file per subject (topic)"""
+    
+    def __init__(self, directory, seed_directory=None):
+        self.directory = directory
+        self.seed_directory = seed_directory
+        self._cache = {}
+        os.makedirs(directory, exist_ok=True)
+    
+    def _path(self, directory, subject):
+        return os.path.join(directory, f"{subject}.json")
+    
+    def _versions(self, subject):
+        """All registered versions of a subject, falling back to the seed file shipped with the job"""
+        if subject not in self._cache:
+            versions = []
+            for directory in (self.directory, self.seed_directory):
+                if directory and os.path.exists(self._path(directory, subject)):
+                    with open(self._path(directory, subject)) as f:
+                        versions = json.load(f)['versions']
+                    break
+            self._cache[subject] = versions
+        return self._cache[subject]
+    
+    def latest(self, subject):
+        """(version, StructType) of the newest schema of a subject, or (0, None) if it has none"""
+        versions = self._versions(subject)
+        if not versions:
+            return 0, None
+        return versions[-1]['version'], StructType.fromJson(versions[-1]['schema'])
+    
+    def register(self, subject, schema):
+        """Evolve the subject to include schema and return the resulting (version, StructType);
+        a new version is only written when columns were added"""
+        version, current = self.latest(subject)
+        merged = schema if current is None else evolve(current, schema)
+        if merged == current:
+            return version, current
+        
+        versions = self._versions(subject) + [{
+            'version': version + 1,
+            'registered_at': int(time.time()),
+            'schema': merged.jsonValue(),
+        }]
+        # Write-then-rename so a crash never leaves a truncated registry file behind
+        path = self._path(self.directory, subject)
+        with open(f"{path}.tmp", 'w') as f:
+            json.dump({'subject': subject, 'versions': versions}, f, indent=2)
+        os.replace(f"{path}.tmp", path)
+        self._cache[subject] = versions
+        return version + 1, merged
+
+
+class BatchLog:
+    """Remembers the last micro-batch written by a foreachBatch sink, so a batch that Spark
+    replays after a restart is not appended to the output a second time"""
+    
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    
+    def last_batch_id(self):
+        if not os.path.exists(self.path):
+            return -1
+        with open(self.path) as f:
+            return int(f.read().strip() or -1)
+    
+    def commit(self, batch_id):
+        with open(f"{self.path}.tmp", 'w') as f:
+            f.write(str(batch_id))
+        os.replace(f"{self.path}.tmp", self.path)
+
+
+class ApicurioClient:
+    """Looks up Avro writer schemas in an Apicurio registry by the id framed into each message"""
+    
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+        self._schemas = {}
+    
+    def schema(self, content_id):
+        """Avro schema JSON for a content id; schemas never change once registered, so they are cached"""
+        if content_id not in self._schemas:
+            with urllib.request.urlopen(f"{self.url}/ids/contentIds/{content_id}", timeout=30) as response:
+                self._schemas[content_id] = response.read().decode('utf-8')
+        return self._schemas[content_id]